@@ -9,16 +9,46 @@ import pandas as pd
 import streamlit as st
 import altair as alt
 
-from src.charts.trend_utils import _normalize_unit_ids
+from src.charts.distance_trend_utils import _prepare_distance_trend_dataframe
 from src.ui.renderers import render_altair_chart
 
 # Pattern to match exclusive distance education enrollment columns
 DE_ENROLL_PATTERN = re.compile(r"^DE_ENROLL_(\d{4})$", re.IGNORECASE)
 
-SECTOR_COLOR_SCALE = alt.Scale(
-    domain=["Public", "Private, not-for-profit", "Private, for-profit", "Unknown"],
-    range=["#2ca02c", "#9467bd", "#1f77b4", "#7f7f7f"],
+# Encodings that do not depend on the data are built once at import; only the
+# institution color scale varies per render.
+_AXIS_STYLE = {"labelFontSize": 14, "titleFontSize": 16, "titleFontWeight": "bold"}
+
+LINE_X = alt.X("Year:Q", title="Year", axis=alt.Axis(format="d", **_AXIS_STYLE))
+LINE_Y = alt.Y(
+    "de_enrollment:Q",
+    title="Exclusive Distance Education Enrollment",
+    axis=alt.Axis(format=".1s", **_AXIS_STYLE),  # Show as thousands: 5k, 10k
+)
+LINE_TOOLTIP = [
+    alt.Tooltip("Institution:N", title="Institution"),
+    alt.Tooltip("Year:Q", title="Year", format=".0f"),
+    alt.Tooltip("de_enrollment:Q", title="Exclusive DE Enrollment", format=","),
+    alt.Tooltip("Sector:N", title="Sector"),
+    alt.Tooltip("YoYChangePercent:Q", title="Year-over-year change (%)", format=".1f"),
+    alt.Tooltip("ChangeDirection:N", title="Change direction"),
+]
+
+STACKED_X = alt.X("Year:O", title="Year", axis=alt.Axis(labelAngle=0, **_AXIS_STYLE))
+STACKED_Y = alt.Y(
+    "de_enrollment:Q",
+    title="Exclusive Distance Education Enrollment",
+    stack="zero",
+    axis=alt.Axis(format="~s", **_AXIS_STYLE),
 )
+STACKED_TOOLTIP = [
+    alt.Tooltip("Institution:N", title="Institution"),
+    alt.Tooltip("Year:O", title="Year"),
+    alt.Tooltip("de_enrollment:Q", title="Institution DE Enrollment", format=","),
+    alt.Tooltip("de_percentage:Q", title="% of Top 10 Total", format=".2f"),
+    alt.Tooltip("year_total_enrollment:Q", title="Total (Top 10)", format=","),
+    alt.Tooltip("Sector:N", title="Sector"),
+]
 
 
 def _identify_de_enrollment_columns(columns: Iterable[str]) -> List[tuple[int, str]]:
@@ -33,6 +63,7 @@ def _identify_de_enrollment_columns(columns: Iterable[str]) -> List[tuple[int, s
     return sorted(discovered)
 
 
+@st.cache_data(show_spinner=False)
 def _prepare_de_trend_dataframe(
     distance_df: pd.DataFrame,
     metadata_df: pd.DataFrame,
@@ -49,202 +80,48 @@ def _prepare_de_trend_dataframe(
             "No exclusive distance education enrollment columns found in dataset."
         )
 
-    working = distance_df.copy()
-    if "UnitID" not in working.columns:
-        raise ValueError(
-            "Distance education dataset missing 'UnitID' column required for charting."
-        )
-
-    # Convert DE enrollment columns to numeric
-    de_field_names = [column for _, column in de_columns]
-    for column in de_field_names:
-        working[column] = pd.to_numeric(working[column], errors="coerce")
-
-    working["UnitID"] = _normalize_unit_ids(working.get("UnitID"))
-
-    # Prepare metadata
-    metadata = metadata_df.copy()
-    required_metadata = {"UnitID", "institution", "sector"}
-    missing_metadata = [
-        column for column in required_metadata if column not in metadata.columns
-    ]
-    if missing_metadata:
-        raise ValueError(
-            "Cannot merge distance education dataset with metadata. Missing columns: "
-            + ", ".join(sorted(missing_metadata))
-        )
-    metadata["UnitID"] = _normalize_unit_ids(metadata.get("UnitID"))
-    metadata["sector"] = metadata["sector"].astype("string")
-
-    # Merge with metadata
-    merged = pd.merge(
-        working,
-        metadata[["UnitID", "institution", "sector"]],
-        on="UnitID",
-        how="inner",
-    )
-    if merged.empty:
-        return pd.DataFrame()
-
-    # Find anchor year column
-    anchor_col = None
-    for year, col in de_columns:
-        if year == anchor_year:
-            anchor_col = col
-            break
-
-    if anchor_col is None:
-        raise ValueError(f"No DE enrollment data found for anchor year {anchor_year}")
-
-    # Get top N institutions by anchor year DE enrollment
-    anchor_data = merged[merged[anchor_col].notna() & (merged[anchor_col] > 0)].copy()
-    if anchor_data.empty:
-        return pd.DataFrame()
-
-    top_institutions = anchor_data.nlargest(top_n, anchor_col)["institution"].tolist()
-
-    # Filter to top institutions
-    filtered = merged[merged["institution"].isin(top_institutions)].copy()
-    if filtered.empty:
-        return pd.DataFrame()
-
-    # Reshape to long format
-    id_vars = ["UnitID", "institution", "sector"]
-    long_form = filtered.melt(
-        id_vars=id_vars,
-        value_vars=de_field_names,
-        var_name="YearLabel",
+    return _prepare_distance_trend_dataframe(
+        distance_df,
+        metadata_df,
+        de_columns,
         value_name="de_enrollment",
+        value_label="DE enrollment",
+        top_n=top_n,
+        anchor_year=anchor_year,
+        include_percentage=True,
     )
 
-    # Extract year from column name
-    long_form["Year"] = (
-        long_form["YearLabel"].str.extract(r"DE_ENROLL_(\d{4})")[0].astype(float)
-    )
-    long_form.dropna(subset=["Year"], inplace=True)
-    if long_form.empty:
-        return pd.DataFrame()
-
-    long_form["Year"] = long_form["Year"].astype(int)
-
-    # Convert DE enrollment to numeric and filter valid values (allow 0 for meaningful trend)
-    long_form["de_enrollment"] = pd.to_numeric(
-        long_form["de_enrollment"], errors="coerce"
-    )
-    long_form = long_form.dropna(subset=["de_enrollment"])
-    if long_form.empty:
-        return pd.DataFrame()
-
-    # Calculate total enrollment per year across top N institutions for percentage calculation
-    year_totals = long_form.groupby("Year")["de_enrollment"].sum().reset_index()
-    year_totals.rename(columns={"de_enrollment": "year_total_enrollment"}, inplace=True)
-
-    # Merge year totals back to long_form
-    long_form = long_form.merge(year_totals, on="Year", how="left")
-
-    # Calculate percentage of total for each institution-year
-    long_form["de_percentage"] = 0.0
-    nonzero_total = long_form["year_total_enrollment"] > 0
-    long_form.loc[nonzero_total, "de_percentage"] = (
-        long_form.loc[nonzero_total, "de_enrollment"]
-        / long_form.loc[nonzero_total, "year_total_enrollment"]
-        * 100
-    ).round(2)
-
-    # Calculate year-over-year changes for dot coloring
-    long_form = long_form.sort_values(["UnitID", "Year"])
-    long_form["PrevYearDEEnrollment"] = long_form.groupby("UnitID")[
-        "de_enrollment"
-    ].shift(1)
-    long_form["YoYChange"] = (
-        long_form["de_enrollment"] - long_form["PrevYearDEEnrollment"]
-    )
-
-    # Handle percentage calculation - avoid division by zero
-    with pd.option_context("mode.chained_assignment", None):
-        long_form["YoYChangePercent"] = 0.0  # Default value
-        mask = long_form["PrevYearDEEnrollment"] > 0
-        long_form.loc[mask, "YoYChangePercent"] = (
-            (
-                long_form.loc[mask, "de_enrollment"]
-                - long_form.loc[mask, "PrevYearDEEnrollment"]
-            )
-            / long_form.loc[mask, "PrevYearDEEnrollment"]
-            * 100
-        ).round(1)
-
-    # Determine change direction for dot coloring (based on percent change)
-    from src.charts.trend_utils import classify_yoy_direction
-
-    long_form["ChangeDirection"] = classify_yoy_direction(long_form["YoYChangePercent"])
-
-    # For first year of each institution, mark as "Same" since no previous year
-    first_year_mask = long_form["PrevYearDEEnrollment"].isna()
-    long_form.loc[first_year_mask, "ChangeDirection"] = "Same"
-    long_form.loc[first_year_mask, "YoYChangePercent"] = 0.0
-
-    # Prepare final columns
-    long_form["Institution"] = long_form["institution"].astype(str)
-    long_form["Sector"] = long_form["sector"].fillna("Unknown").replace("", "Unknown")
-    long_form["AnchorYear"] = anchor_year
-
-    # Clean up columns
-    final_columns = [
-        "UnitID",
-        "Institution",
-        "Sector",
-        "Year",
-        "de_enrollment",
-        "de_percentage",
-        "year_total_enrollment",
-        "AnchorYear",
-        "ChangeDirection",
-        "YoYChangePercent",
-    ]
-
-    return long_form[final_columns].copy()
 
+def _render_de_data_table(
+    prepared: pd.DataFrame,
+    top_n: int,
+    anchor_year: int,
+    year_columns: List[str],
+) -> None:
+    """Render data table showing exclusive distance education enrollment figures and percentages for each institution by year.
 
-def _render_de_data_table(prepared: pd.DataFrame, top_n: int, anchor_year: int) -> None:
-    """Render data table showing exclusive distance education enrollment figures and percentages for each institution by year."""
+    ``year_columns`` lists the charted years as strings in ascending order, as
+    identified from the source DE enrollment columns.
+    """
     if prepared.empty:
         return
 
-    # Create pivot tables from long format data - one for enrollment, one for percentage
-    pivot_enrollment = prepared.pivot_table(
-        index=["Institution", "Sector"],
-        columns="Year",
-        values="de_enrollment",
-        aggfunc="first",
-    ).reset_index()
-
-    pivot_percentage = prepared.pivot_table(
-        index=["Institution", "Sector"],
-        columns="Year",
-        values="de_percentage",
-        aggfunc="first",
-    ).reset_index()
-
+    # Reshape long format data to one row per institution, with enrollment and
+    # percentage columns per year from a single unstack. UnitID keeps the
+    # index unique when two institutions share a name.
+    wide = prepared.set_index(["UnitID", "Institution", "Sector", "Year"])[
+        ["de_enrollment", "de_percentage"]
+    ].unstack("Year")
     # Convert year column names to strings to avoid mixed type warning
-    year_columns_enroll = [
-        col for col in pivot_enrollment.columns if isinstance(col, int)
+    wide.columns = [
+        str(year) if value == "de_enrollment" else f"{year} %"
+        for value, year in wide.columns
     ]
-    column_mapping_enroll = {col: str(col) for col in year_columns_enroll}
-    pivot_enrollment = pivot_enrollment.rename(columns=column_mapping_enroll)
-
-    year_columns_pct = [col for col in pivot_percentage.columns if isinstance(col, int)]
-    column_mapping_pct = {col: f"{col} %" for col in year_columns_pct}
-    pivot_percentage = pivot_percentage.rename(columns=column_mapping_pct)
-
-    # Merge enrollment and percentage data
-    pivot_data = pivot_enrollment.copy()
-    for col in pivot_percentage.columns:
-        if col not in ["Institution", "Sector"]:
-            pivot_data[col] = pivot_percentage[col]
+    pivot_data = wide.reset_index().drop(columns="UnitID")
 
     # Format DE enrollment numbers and calculate change
-    year_columns = [col for col in pivot_data.columns if col.isdigit()]
-    year_columns.sort()
+    year_columns = [year for year in year_columns if year in pivot_data.columns]
+    pct_columns = [f"{year} %" for year in year_columns]
 
     # Calculate total change from first to last year
     if len(year_columns) >= 2:
@@ -261,42 +138,33 @@ def _render_de_data_table(prepared: pd.DataFrame, top_n: int, anchor_year: int)
                 total_change.append(None)
         pivot_data["Total Change"] = total_change
 
-    # Format the display table
-    display_data = pivot_data.copy()
-
-    # Format enrollment columns
-    for year in year_columns:
-        display_data[year] = display_data[year].apply(
-            lambda x: f"{x:,.0f}" if pd.notna(x) else "N/A"
-        )
-
-    # Format percentage columns
-    pct_columns = [col for col in display_data.columns if col.endswith(" %")]
-    for col in pct_columns:
-        display_data[col] = display_data[col].apply(
-            lambda x: f"{x:.2f}%" if pd.notna(x) else "N/A"
-        )
-
-    if "Total Change" in display_data.columns:
-        display_data["Total Change"] = display_data["Total Change"].apply(
-            lambda x: f"{x:+.1f}%" if pd.notna(x) else "N/A"
-        )
-
     # Sort by anchor year DE enrollment (descending)
+    display_data = pivot_data
     anchor_year_str = str(anchor_year)
-    if anchor_year_str in pivot_data.columns:
-        sort_col_idx = pivot_data.columns.get_loc(anchor_year_str)
-        numeric_data = pivot_data.iloc[:, sort_col_idx]
-        display_data = display_data.iloc[
-            numeric_data.sort_values(ascending=False).index
-        ]
+    if anchor_year_str in display_data.columns:
+        display_data = display_data.sort_values(anchor_year_str, ascending=False)
+
+    # Values stay numeric; Streamlit formats them in the browser
+    column_config = {
+        year: st.column_config.NumberColumn(year, format="%,d") for year in year_columns
+    }
+    for col in pct_columns:
+        column_config[col] = st.column_config.NumberColumn(col, format="%.2f%%")
+    column_config["Total Change"] = st.column_config.NumberColumn(
+        "Total Change", format="%+.1f%%"
+    )
 
     st.subheader("📊 Exclusive Distance Education Enrollment Data")
     st.caption(
         f"Exclusive distance education enrollment figures and percentages for top {top_n} institutions by {anchor_year} DE enrollment. "
         f"Percentage columns (%) show each institution's share of total enrollment among the top {top_n} for that year."
     )
-    st.dataframe(display_data, width="stretch", hide_index=True)
+    st.dataframe(
+        display_data,
+        width="stretch",
+        hide_index=True,
+        column_config=column_config,
+    )
 
 
 def render_distance_de_trend_chart(
@@ -327,7 +195,7 @@ def render_distance_de_trend_chart(
         return
 
     # Create institution-based color scale
-    institutions = prepared["Institution"].unique()
+    institutions = prepared["Institution"].drop_duplicates().to_numpy()
     institution_color_scale = alt.Scale(domain=list(institutions), scheme="category20")
 
     # Line chart with solid lines and filled points colored by institution
@@ -335,45 +203,12 @@ def render_distance_de_trend_chart(
         alt.Chart(prepared)
         .mark_line(strokeWidth=3, point=alt.OverlayMarkDef(size=100, filled=True))
         .encode(
-            x=alt.X(
-                "Year:Q",
-                title="Year",
-                axis=alt.Axis(
-                    format="d",
-                    labelFontSize=14,
-                    titleFontSize=16,
-                    titleFontWeight="bold",
-                ),
-            ),
-            y=alt.Y(
-                "de_enrollment:Q",
-                title="Exclusive Distance Education Enrollment",
-                axis=alt.Axis(
-                    format=".1s",  # Show as thousands: 5k, 10k
-                    labelFontSize=14,
-                    titleFontSize=16,
-                    titleFontWeight="bold",
-                ),
-            ),
+            x=LINE_X,
+            y=LINE_Y,
             color=alt.Color(
                 "Institution:N", title="Institution", scale=institution_color_scale
             ),
-            tooltip=[
-                alt.Tooltip("Institution:N", title="Institution"),
-                alt.Tooltip("Year:Q", title="Year", format=".0f"),
-                alt.Tooltip(
-                    "de_enrollment:Q",
-                    title="Exclusive DE Enrollment",
-                    format=",",
-                ),
-                alt.Tooltip("Sector:N", title="Sector"),
-                alt.Tooltip(
-                    "YoYChangePercent:Q",
-                    title="Year-over-year change (%)",
-                    format=".1f",
-                ),
-                alt.Tooltip("ChangeDirection:N", title="Change direction"),
-            ],
+            tooltip=LINE_TOOLTIP,
         )
         .properties(height=520)
     )
@@ -400,27 +235,8 @@ def render_distance_de_trend_chart(
         alt.Chart(stacked_data)
         .mark_bar()
         .encode(
-            x=alt.X(
-                "Year:O",
-                title="Year",
-                axis=alt.Axis(
-                    labelAngle=0,
-                    labelFontSize=14,
-                    titleFontSize=16,
-                    titleFontWeight="bold",
-                ),
-            ),
-            y=alt.Y(
-                "de_enrollment:Q",
-                title="Exclusive Distance Education Enrollment",
-                stack="zero",
-                axis=alt.Axis(
-                    format="~s",
-                    labelFontSize=14,
-                    titleFontSize=16,
-                    titleFontWeight="bold",
-                ),
-            ),
+            x=STACKED_X,
+            y=STACKED_Y,
             color=alt.Color(
                 "Institution:N",
                 title="Institution",
@@ -430,18 +246,7 @@ def render_distance_de_trend_chart(
                 ),
             ),
             order=alt.Order("de_enrollment:Q", sort="descending"),
-            tooltip=[
-                alt.Tooltip("Institution:N", title="Institution"),
-                alt.Tooltip("Year:O", title="Year"),
-                alt.Tooltip(
-                    "de_enrollment:Q", title="Institution DE Enrollment", format=","
-                ),
-                alt.Tooltip("de_percentage:Q", title="% of Top 10 Total", format=".2f"),
-                alt.Tooltip(
-                    "year_total_enrollment:Q", title="Total (Top 10)", format=","
-                ),
-                alt.Tooltip("Sector:N", title="Sector"),
-            ],
+            tooltip=STACKED_TOOLTIP,
         )
         .properties(height=450)
     )
@@ -454,4 +259,7 @@ def render_distance_de_trend_chart(
     render_altair_chart(stacked_chart)
 
     # Create data table
-    _render_de_data_table(prepared, top_n, anchor_year)
+    year_columns = [
+        str(year) for year, _ in _identify_de_enrollment_columns(distance_df.columns)
+    ]
+    _render_de_data_table(prepared, top_n, anchor_year, year_columns)
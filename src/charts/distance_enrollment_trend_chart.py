@@ -9,16 +9,46 @@ import pandas as pd
 import streamlit as st
 import altair as alt
 
-from src.charts.trend_utils import _normalize_unit_ids
+from src.charts.distance_trend_utils import _prepare_distance_trend_dataframe
 from src.ui.renderers import render_altair_chart
 
 # Pattern to match total enrollment columns
 TOTAL_ENROLL_PATTERN = re.compile(r"^TOTAL_ENROLL_(\d{4})$", re.IGNORECASE)
 
-SECTOR_COLOR_SCALE = alt.Scale(
-    domain=["Public", "Private, not-for-profit", "Private, for-profit", "Unknown"],
-    range=["#2ca02c", "#9467bd", "#1f77b4", "#7f7f7f"],
+# Encodings that do not depend on the data are built once at import; only the
+# institution color scale varies per render.
+_AXIS_STYLE = {"labelFontSize": 14, "titleFontSize": 16, "titleFontWeight": "bold"}
+
+LINE_X = alt.X("Year:Q", title="Year", axis=alt.Axis(format="d", **_AXIS_STYLE))
+LINE_Y = alt.Y(
+    "enrollment:Q",
+    title="Total Enrollment",
+    axis=alt.Axis(format=".1s", **_AXIS_STYLE),  # Show as thousands: 5k, 10k
+)
+LINE_TOOLTIP = [
+    alt.Tooltip("Institution:N", title="Institution"),
+    alt.Tooltip("Year:Q", title="Year", format=".0f"),
+    alt.Tooltip("enrollment:Q", title="Total Enrollment", format=","),
+    alt.Tooltip("Sector:N", title="Sector"),
+    alt.Tooltip("YoYChangePercent:Q", title="Year-over-year change (%)", format=".1f"),
+    alt.Tooltip("ChangeDirection:N", title="Change direction"),
+]
+
+STACKED_X = alt.X("Year:O", title="Year", axis=alt.Axis(labelAngle=0, **_AXIS_STYLE))
+STACKED_Y = alt.Y(
+    "enrollment:Q",
+    title="Total Enrollment",
+    stack="zero",
+    axis=alt.Axis(format="~s", **_AXIS_STYLE),
 )
+STACKED_TOOLTIP = [
+    alt.Tooltip("Institution:N", title="Institution"),
+    alt.Tooltip("Year:O", title="Year"),
+    alt.Tooltip("enrollment:Q", title="Institution Enrollment", format=","),
+    alt.Tooltip("percentage:Q", title="% of Top 10 Total", format=".2f"),
+    alt.Tooltip("year_total:Q", title="Total (Top 10)", format=","),
+    alt.Tooltip("Sector:N", title="Sector"),
+]
 
 
 def _identify_total_enrollment_columns(columns: Iterable[str]) -> List[tuple[int, str]]:
@@ -33,6 +63,7 @@ def _identify_total_enrollment_columns(columns: Iterable[str]) -> List[tuple[int
     return sorted(discovered)
 
 
+@st.cache_data(show_spinner=False)
 def _prepare_enrollment_trend_dataframe(
     distance_df: pd.DataFrame,
     metadata_df: pd.DataFrame,
@@ -49,131 +80,17 @@ def _prepare_enrollment_trend_dataframe(
             "No total enrollment columns found in distance education dataset."
         )
 
-    working = distance_df.copy()
-    if "UnitID" not in working.columns:
-        raise ValueError(
-            "Distance education dataset missing 'UnitID' column required for charting."
-        )
-
-    # Convert enrollment columns to numeric
-    enrollment_field_names = [column for _, column in enrollment_columns]
-    for column in enrollment_field_names:
-        working[column] = pd.to_numeric(working[column], errors="coerce")
-
-    working["UnitID"] = _normalize_unit_ids(working.get("UnitID"))
-
-    # Prepare metadata
-    metadata = metadata_df.copy()
-    required_metadata = {"UnitID", "institution", "sector"}
-    missing_metadata = [
-        column for column in required_metadata if column not in metadata.columns
-    ]
-    if missing_metadata:
-        raise ValueError(
-            "Cannot merge distance education dataset with metadata. Missing columns: "
-            + ", ".join(sorted(missing_metadata))
-        )
-    metadata["UnitID"] = _normalize_unit_ids(metadata.get("UnitID"))
-    metadata["sector"] = metadata["sector"].astype("string")
-
-    # Merge with metadata
-    merged = pd.merge(
-        working,
-        metadata[["UnitID", "institution", "sector"]],
-        on="UnitID",
-        how="inner",
-    )
-    if merged.empty:
-        return pd.DataFrame()
-
-    # Find anchor year column
-    anchor_col = None
-    for year, col in enrollment_columns:
-        if year == anchor_year:
-            anchor_col = col
-            break
-
-    if anchor_col is None:
-        raise ValueError(f"No enrollment data found for anchor year {anchor_year}")
-
-    # Get top N institutions by anchor year enrollment
-    anchor_data = merged[merged[anchor_col].notna() & (merged[anchor_col] > 0)].copy()
-    if anchor_data.empty:
-        return pd.DataFrame()
-
-    top_institutions = anchor_data.nlargest(top_n, anchor_col)["institution"].tolist()
-
-    # Filter to top institutions
-    filtered = merged[merged["institution"].isin(top_institutions)].copy()
-    if filtered.empty:
-        return pd.DataFrame()
-
-    # Reshape to long format
-    id_vars = ["UnitID", "institution", "sector"]
-    long_form = filtered.melt(
-        id_vars=id_vars,
-        value_vars=enrollment_field_names,
-        var_name="YearLabel",
+    return _prepare_distance_trend_dataframe(
+        distance_df,
+        metadata_df,
+        enrollment_columns,
         value_name="enrollment",
+        value_label="enrollment",
+        top_n=top_n,
+        anchor_year=anchor_year,
+        include_percentage=False,
     )
 
-    # Extract year from column name
-    long_form["Year"] = (
-        long_form["YearLabel"].str.extract(r"TOTAL_ENROLL_(\d{4})")[0].astype(float)
-    )
-    long_form.dropna(subset=["Year"], inplace=True)
-    if long_form.empty:
-        return pd.DataFrame()
-
-    long_form["Year"] = long_form["Year"].astype(int)
-
-    # Convert enrollment to numeric and filter valid values
-    long_form["enrollment"] = pd.to_numeric(long_form["enrollment"], errors="coerce")
-    long_form = long_form.dropna(subset=["enrollment"])
-    if long_form.empty:
-        return pd.DataFrame()
-
-    # Calculate year-over-year changes for dot coloring
-    long_form = long_form.sort_values(["UnitID", "Year"])
-    long_form["PrevYearEnrollment"] = long_form.groupby("UnitID")["enrollment"].shift(1)
-    long_form["YoYChange"] = long_form["enrollment"] - long_form["PrevYearEnrollment"]
-    long_form["YoYChangePercent"] = 0.0
-    prev_nonzero = long_form["PrevYearEnrollment"] > 0
-    long_form.loc[prev_nonzero, "YoYChangePercent"] = (
-        long_form.loc[prev_nonzero, "YoYChange"]
-        / long_form.loc[prev_nonzero, "PrevYearEnrollment"]
-        * 100
-    ).round(1)
-
-    # Determine change direction for dot coloring (based on percent change)
-    from src.charts.trend_utils import classify_yoy_direction
-
-    long_form["ChangeDirection"] = classify_yoy_direction(long_form["YoYChangePercent"])
-
-    # For first year of each institution, mark as "Same" since no previous year
-    first_year_mask = long_form["PrevYearEnrollment"].isna()
-    long_form.loc[first_year_mask, "ChangeDirection"] = "Same"
-    long_form.loc[first_year_mask, "YoYChangePercent"] = 0.0
-
-    # Prepare final columns
-    long_form["Institution"] = long_form["institution"].astype(str)
-    long_form["Sector"] = long_form["sector"].fillna("Unknown").replace("", "Unknown")
-    long_form["AnchorYear"] = anchor_year
-
-    # Clean up columns
-    final_columns = [
-        "UnitID",
-        "Institution",
-        "Sector",
-        "Year",
-        "enrollment",
-        "AnchorYear",
-        "ChangeDirection",
-        "YoYChangePercent",
-    ]
-
-    return long_form[final_columns].copy()
-
 
 def _render_enrollment_data_table(
     prepared: pd.DataFrame, top_n: int, anchor_year: int
@@ -182,13 +99,17 @@ def _render_enrollment_data_table(
     if prepared.empty:
         return
 
-    # Create pivot table from long format data
-    pivot_data = prepared.pivot_table(
-        index=["Institution", "Sector"],
-        columns="Year",
-        values="enrollment",
-        aggfunc="first",
-    ).reset_index()
+    # Reshape long format data to one row per institution. UnitID keeps the
+    # index unique when two institutions share a name.
+    pivot_data = (
+        prepared.pivot(
+            index=["UnitID", "Institution", "Sector"],
+            columns="Year",
+            values="enrollment",
+        )
+        .reset_index()
+        .drop(columns="UnitID")
+    )
 
     # Convert year column names to strings to avoid mixed type warning
     year_columns = [col for col in pivot_data.columns if isinstance(col, int)]
@@ -208,32 +129,30 @@ def _render_enrollment_data_table(
             * 100
         ).round(1)
 
-    # Format the display table
-    display_data = pivot_data.copy()
-    for year in year_columns:
-        display_data[year] = display_data[year].apply(
-            lambda x: f"{x:,.0f}" if pd.notna(x) else "N/A"
-        )
-
-    if "Total Change" in display_data.columns:
-        display_data["Total Change"] = display_data["Total Change"].apply(
-            lambda x: f"{x:+.1f}%" if pd.notna(x) else "N/A"
-        )
-
     # Sort by anchor year enrollment (descending)
+    display_data = pivot_data
     anchor_year_str = str(anchor_year)
-    if anchor_year_str in pivot_data.columns:
-        sort_col_idx = pivot_data.columns.get_loc(anchor_year_str)
-        numeric_data = pivot_data.iloc[:, sort_col_idx]
-        display_data = display_data.iloc[
-            numeric_data.sort_values(ascending=False).index
-        ]
+    if anchor_year_str in display_data.columns:
+        display_data = display_data.sort_values(anchor_year_str, ascending=False)
+
+    # Values stay numeric; Streamlit formats them in the browser
+    column_config = {
+        year: st.column_config.NumberColumn(year, format="%,d") for year in year_columns
+    }
+    column_config["Total Change"] = st.column_config.NumberColumn(
+        "Total Change", format="%+.1f%%"
+    )
 
     st.subheader("📊 Enrollment Data")
     st.caption(
         f"Total enrollment figures for top {top_n} institutions by {anchor_year} enrollment."
     )
-    st.dataframe(display_data, width="stretch", hide_index=True)
+    st.dataframe(
+        display_data,
+        width="stretch",
+        hide_index=True,
+        column_config=column_config,
+    )
 
 
 def render_distance_enrollment_trend_chart(
@@ -270,45 +189,12 @@ def render_distance_enrollment_trend_chart(
         alt.Chart(prepared)
         .mark_line(strokeWidth=3, point=alt.OverlayMarkDef(size=100, filled=True))
         .encode(
-            x=alt.X(
-                "Year:Q",
-                title="Year",
-                axis=alt.Axis(
-                    format="d",
-                    labelFontSize=14,
-                    titleFontSize=16,
-                    titleFontWeight="bold",
-                ),
-            ),
-            y=alt.Y(
-                "enrollment:Q",
-                title="Total Enrollment",
-                axis=alt.Axis(
-                    format=".1s",  # Show as thousands: 50k, 100k
-                    labelFontSize=14,
-                    titleFontSize=16,
-                    titleFontWeight="bold",
-                ),
-            ),
+            x=LINE_X,
+            y=LINE_Y,
             color=alt.Color(
                 "Institution:N", title="Institution", scale=institution_color_scale
             ),
-            tooltip=[
-                alt.Tooltip("Institution:N", title="Institution"),
-                alt.Tooltip("Year:Q", title="Year", format=".0f"),
-                alt.Tooltip(
-                    "enrollment:Q",
-                    title="Total Enrollment",
-                    format=",",
-                ),
-                alt.Tooltip("Sector:N", title="Sector"),
-                alt.Tooltip(
-                    "YoYChangePercent:Q",
-                    title="Year-over-year change (%)",
-                    format=".1f",
-                ),
-                alt.Tooltip("ChangeDirection:N", title="Change direction"),
-            ],
+            tooltip=LINE_TOOLTIP,
         )
         .properties(height=520)
     )
@@ -341,27 +227,8 @@ def render_distance_enrollment_trend_chart(
         alt.Chart(stacked_data)
         .mark_bar()
         .encode(
-            x=alt.X(
-                "Year:O",
-                title="Year",
-                axis=alt.Axis(
-                    labelAngle=0,
-                    labelFontSize=14,
-                    titleFontSize=16,
-                    titleFontWeight="bold",
-                ),
-            ),
-            y=alt.Y(
-                "enrollment:Q",
-                title="Total Enrollment",
-                stack="zero",
-                axis=alt.Axis(
-                    format="~s",
-                    labelFontSize=14,
-                    titleFontSize=16,
-                    titleFontWeight="bold",
-                ),
-            ),
+            x=STACKED_X,
+            y=STACKED_Y,
             color=alt.Color(
                 "Institution:N",
                 title="Institution",
@@ -371,14 +238,7 @@ def render_distance_enrollment_trend_chart(
                 ),
             ),
             order=alt.Order("enrollment:Q", sort="descending"),
-            tooltip=[
-                alt.Tooltip("Institution:N", title="Institution"),
-                alt.Tooltip("Year:O", title="Year"),
-                alt.Tooltip("enrollment:Q", title="Institution Enrollment", format=","),
-                alt.Tooltip("percentage:Q", title="% of Top 10 Total", format=".2f"),
-                alt.Tooltip("year_total:Q", title="Total (Top 10)", format=","),
-                alt.Tooltip("Sector:N", title="Sector"),
-            ],
+            tooltip=STACKED_TOOLTIP,
         )
         .properties(height=450)
     )
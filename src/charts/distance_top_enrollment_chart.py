@@ -7,24 +7,44 @@ from dataclasses import dataclass
 from typing import Iterable, List, Optional
 
 import altair as alt
+import numpy as np
 import pandas as pd
 import streamlit as st
 
-from src.charts.trend_utils import _normalize_unit_ids
+from src.charts.metadata_utils import _prepare_metadata
+from src.charts.trend_utils import (
+    _drop_missing_unit_ids,
+    _normalize_unit_ids,
+    _top_n_positions,
+)
 from src.ui.renderers import render_altair_chart, render_dataframe
 
-# Pattern to match total enrollment columns
-TOTAL_ENROLL_PATTERN = re.compile(r"^TOTAL_ENROLL_(\d{4})$", re.IGNORECASE)
-# Pattern to match exclusive distance education columns
-DE_ENROLL_PATTERN = re.compile(r"^DE_ENROLL_(\d{4})$", re.IGNORECASE)
-# Pattern to match some distance education columns
-SDE_ENROLL_PATTERN = re.compile(r"^SDE_ENROLL_(\d{4})$", re.IGNORECASE)
+# Pattern to match total, exclusive DE and some DE enrollment columns. The
+# some-DE count for 2024 is published as SDE_ENROLL_TOTAL.
+ENROLL_PATTERN = re.compile(r"^(TOTAL|DE|SDE)_ENROLL_(\d{4}|TOTAL)$", re.IGNORECASE)
+SDE_TOTAL_YEAR = 2024
+
+# Enrollment breakdown categories, in stacking order
+ENROLLMENT_TYPES = (
+    "Exclusively Distance Education",
+    "Some Distance Education",
+    "In-Person Only",
+)
 
-SECTOR_COLOR_SCALE = alt.Scale(
-    domain=["Public", "Private, not-for-profit", "Private, for-profit", "Unknown"],
-    range=["#2ca02c", "#9467bd", "#1f77b4", "#7f7f7f"],
+# Chart scale and tooltips are constant, so they are built once at import
+ENROLLMENT_TYPE_COLOR_SCALE = alt.Scale(
+    domain=list(ENROLLMENT_TYPES),
+    range=["#d62728", "#ff7f0e", "#2ca02c"],  # Red, Orange, Green
 )
 
+TOOLTIP = [
+    alt.Tooltip("Institution:N", title="Institution"),
+    alt.Tooltip("Enrollment_Type:N", title="Enrollment Type"),
+    alt.Tooltip("Enrollment:Q", title="Students", format=","),
+    alt.Tooltip("Total_Enrollment:Q", title="Total Enrollment", format=","),
+    alt.Tooltip("Sector:N", title="Sector"),
+]
+
 
 @dataclass(frozen=True)
 class DistanceTopEnrollmentResult:
@@ -39,37 +59,26 @@ def _identify_enrollment_columns(
     total_columns: List[tuple[int, str]] = []
     de_columns: List[tuple[int, str]] = []
     sde_columns: List[tuple[int, str]] = []
+    columns_by_kind = {"TOTAL": total_columns, "DE": de_columns, "SDE": sde_columns}
 
     for column in columns:
-        normalized = column.strip()
-
-        # Check for total enrollment
-        total_match = TOTAL_ENROLL_PATTERN.match(normalized)
-        if total_match:
-            year = int(total_match.group(1))
-            total_columns.append((year, column))
+        match = ENROLL_PATTERN.match(column.strip())
+        if not match:
             continue
-
-        # Check for exclusive distance education
-        de_match = DE_ENROLL_PATTERN.match(normalized)
-        if de_match:
-            year = int(de_match.group(1))
-            de_columns.append((year, column))
+        kind = match.group(1).upper()
+        year_token = match.group(2)
+        if year_token.isdigit():
+            year = int(year_token)
+        elif kind == "SDE":
+            year = SDE_TOTAL_YEAR
+        else:
             continue
-
-        # Check for some distance education (handle special case for 2024)
-        if column == "SDE_ENROLL_TOTAL":
-            sde_columns.append((2024, column))
-            continue
-
-        sde_match = SDE_ENROLL_PATTERN.match(normalized)
-        if sde_match:
-            year = int(sde_match.group(1))
-            sde_columns.append((year, column))
+        columns_by_kind[kind].append((year, column))
 
     return sorted(total_columns), sorted(de_columns), sorted(sde_columns)
 
 
+@st.cache_data(show_spinner=False)
 def _prepare_distance_enrollment_dataframe(
     distance_df: pd.DataFrame, metadata_df: pd.DataFrame, top_n: int, year: int = 2024
 ) -> DistanceTopEnrollmentResult:
@@ -86,8 +95,7 @@ def _prepare_distance_enrollment_dataframe(
             "No total enrollment columns found in distance education dataset."
         )
 
-    working = distance_df.copy()
-    if "UnitID" not in working.columns:
+    if "UnitID" not in distance_df.columns:
         raise ValueError(
             "Distance education dataset missing 'UnitID' column required for charting."
         )
@@ -115,99 +123,76 @@ def _prepare_distance_enrollment_dataframe(
     if not total_col:
         raise ValueError(f"No total enrollment data found for year {year}")
 
-    # Convert enrollment columns to numeric
-    working[total_col] = pd.to_numeric(working[total_col], errors="coerce")
+    # Work on just the key and the selected year's enrollment columns
+    working = distance_df[
+        ["UnitID", total_col] + [column for column in (de_col, sde_col) if column]
+    ].copy()
+
+    # Convert enrollment columns to numeric; pandas downcasts to float32 only
+    # within an absolute tolerance of 5e-4, exact for whole-number headcounts
+    working[total_col] = pd.to_numeric(
+        working[total_col], errors="coerce", downcast="float"
+    )
     if de_col:
-        working[de_col] = pd.to_numeric(working[de_col], errors="coerce")
+        working[de_col] = pd.to_numeric(
+            working[de_col], errors="coerce", downcast="float"
+        )
     if sde_col:
-        working[sde_col] = pd.to_numeric(working[sde_col], errors="coerce")
+        working[sde_col] = pd.to_numeric(
+            working[sde_col], errors="coerce", downcast="float"
+        )
 
     working["UnitID"] = _normalize_unit_ids(working.get("UnitID"))
+    working = _drop_missing_unit_ids(working)
 
     # Prepare metadata
-    metadata = metadata_df.copy()
-    required_metadata = {"UnitID", "institution", "sector"}
-    missing_metadata = [
-        column for column in required_metadata if column not in metadata.columns
+    metadata = _prepare_metadata(metadata_df, "distance education")
+
+    # Filter and rank before joining metadata so the join only touches the
+    # top N rows. Restricting to UnitIDs that have metadata first keeps the
+    # ranking the same as ranking the merged frame.
+    working = working[
+        working["UnitID"].isin(metadata.index)
+        & working[total_col].notna()
+        & (working[total_col] > 0)
     ]
-    if missing_metadata:
-        raise ValueError(
-            "Cannot merge distance education dataset with metadata. Missing columns: "
-            + ", ".join(sorted(missing_metadata))
-        )
-    metadata["UnitID"] = _normalize_unit_ids(metadata.get("UnitID"))
-    metadata["sector"] = metadata["sector"].astype("string")
-
-    # Merge with metadata
-    merged = pd.merge(
-        working,
-        metadata[["UnitID", "institution", "sector"]],
-        on="UnitID",
-        how="inner",
+    if working.empty:
+        return DistanceTopEnrollmentResult(period_label=None, chart_data=working)
+
+    # Get top N institutions by total enrollment, then attach names and sectors
+    top_institutions = working.iloc[
+        _top_n_positions(working[total_col].to_numpy(), top_n)
+    ].join(metadata, on="UnitID", how="inner")
+
+    # Prepare chart data: one row per institution and enrollment type
+    total_enrollment = top_institutions[total_col].to_numpy(dtype=float)
+    exclusive_de = (
+        top_institutions[de_col].fillna(0).to_numpy(dtype=float)
+        if de_col
+        else np.zeros(len(top_institutions))
+    )
+    some_de = (
+        top_institutions[sde_col].fillna(0).to_numpy(dtype=float)
+        if sde_col
+        else np.zeros(len(top_institutions))
+    )
+    # In-person enrollment is whatever remains after DE students
+    in_person = np.maximum(0, total_enrollment - exclusive_de - some_de)
+
+    # One wide row per institution with a column per enrollment type; the
+    # chart folds these into stacked segments, and the table reads them as is
+    chart_df = pd.DataFrame(
+        {
+            "Institution": top_institutions["institution"].to_numpy(),
+            "Sector": top_institutions["sector"].cat.remove_unused_categories().array,
+            "UnitID": top_institutions["UnitID"].to_numpy(),
+            "Total_Enrollment": total_enrollment,
+            "Year": year,
+            ENROLLMENT_TYPES[0]: exclusive_de,
+            ENROLLMENT_TYPES[1]: some_de,
+            ENROLLMENT_TYPES[2]: in_person,
+        }
     )
-    if merged.empty:
-        return DistanceTopEnrollmentResult(period_label=None, chart_data=merged)
-
-    # Filter to institutions with valid total enrollment data
-    merged = merged[merged[total_col].notna() & (merged[total_col] > 0)].copy()
-    if merged.empty:
-        return DistanceTopEnrollmentResult(period_label=None, chart_data=merged)
-
-    # Get top N institutions by total enrollment
-    top_institutions = merged.nlargest(top_n, total_col).copy()
-
-    # Prepare chart data
-    chart_data = []
-    for _, row in top_institutions.iterrows():
-        institution = row["institution"]
-        sector = row["sector"]
-        unit_id = row["UnitID"]
-        total_enrollment = row[total_col]
-
-        # Get DE enrollments, default to 0 if missing
-        exclusive_de = row[de_col] if de_col and pd.notna(row[de_col]) else 0
-        some_de = row[sde_col] if sde_col and pd.notna(row[sde_col]) else 0
-
-        # Calculate in-person enrollment (remaining after DE students)
-        in_person = max(0, total_enrollment - exclusive_de - some_de)
-
-        # Add rows for each enrollment type
-        chart_data.extend(
-            [
-                {
-                    "Institution": institution,
-                    "Sector": sector,
-                    "UnitID": unit_id,
-                    "Enrollment_Type": "Exclusively Distance Education",
-                    "Enrollment": exclusive_de,
-                    "Total_Enrollment": total_enrollment,
-                    "Year": year,
-                },
-                {
-                    "Institution": institution,
-                    "Sector": sector,
-                    "UnitID": unit_id,
-                    "Enrollment_Type": "Some Distance Education",
-                    "Enrollment": some_de,
-                    "Total_Enrollment": total_enrollment,
-                    "Year": year,
-                },
-                {
-                    "Institution": institution,
-                    "Sector": sector,
-                    "UnitID": unit_id,
-                    "Enrollment_Type": "In-Person Only",
-                    "Enrollment": in_person,
-                    "Total_Enrollment": total_enrollment,
-                    "Year": year,
-                },
-            ]
-        )
-
-    chart_df = pd.DataFrame(chart_data)
-
-    # Fill missing sectors
-    chart_df["Sector"] = chart_df["Sector"].fillna("Unknown").replace("", "Unknown")
 
     return DistanceTopEnrollmentResult(period_label=str(year), chart_data=chart_df)
 
@@ -234,26 +219,18 @@ def render_distance_top_enrollment_chart(
         st.warning("No distance education enrollment data available to chart.")
         return
 
-    chart_data = prepared.chart_data.copy()
+    chart_data = prepared.chart_data
 
     period_suffix = f" ({prepared.period_label})" if prepared.period_label else ""
     chart_title = f"{title}{period_suffix}"
 
-    # Create enrollment type color scale for stacking
-    enrollment_type_color_scale = alt.Scale(
-        domain=[
-            "Exclusively Distance Education",
-            "Some Distance Education",
-            "In-Person Only",
-        ],
-        range=["#d62728", "#ff7f0e", "#2ca02c"],  # Red, Orange, Green
-    )
-
     # Calculate number of unique institutions for height
     num_institutions = chart_data["Institution"].nunique()
 
     chart = (
         alt.Chart(chart_data)
+        # Vega-Lite unpivots the per-type columns, so no long frame is built
+        .transform_fold(list(ENROLLMENT_TYPES), as_=["Enrollment_Type", "Enrollment"])
         .mark_bar()
         .encode(
             x=alt.X(
@@ -271,21 +248,11 @@ def render_distance_top_enrollment_chart(
             color=alt.Color(
                 "Enrollment_Type:N",
                 title="Enrollment Type",
-                scale=enrollment_type_color_scale,
-                sort=[
-                    "Exclusively Distance Education",
-                    "Some Distance Education",
-                    "In-Person Only",
-                ],
+                scale=ENROLLMENT_TYPE_COLOR_SCALE,
+                sort=list(ENROLLMENT_TYPES),
             ),
             order=alt.Order("Enrollment_Type:N", sort="ascending"),
-            tooltip=[
-                alt.Tooltip("Institution:N", title="Institution"),
-                alt.Tooltip("Enrollment_Type:N", title="Enrollment Type"),
-                alt.Tooltip("Enrollment:Q", title="Students", format=","),
-                alt.Tooltip("Total_Enrollment:Q", title="Total Enrollment", format=","),
-                alt.Tooltip("Sector:N", title="Sector"),
-            ],
+            tooltip=TOOLTIP,
         )
         .properties(height=max(400, 25 * num_institutions), title=chart_title)
     )
@@ -296,33 +263,25 @@ def render_distance_top_enrollment_chart(
     st.caption(caption_text)
     render_altair_chart(chart)
 
-    # Create summary table
-    summary_table = chart_data.pivot_table(
-        index=["Institution", "Sector", "Total_Enrollment"],
-        columns="Enrollment_Type",
-        values="Enrollment",
-        aggfunc="sum",
-        fill_value=0,
-    ).reset_index()
-
-    # Sort by total enrollment descending
-    summary_table = summary_table.sort_values("Total_Enrollment", ascending=False)
-
-    # Rename columns for clarity
-    summary_table.rename(
-        columns={
-            "Total_Enrollment": "Total Enrollment",
-            "Sector": "Sector",
-            "Exclusively Distance Education": "Exclusive DE",
-            "Some Distance Education": "Some DE",
-            "In-Person Only": "In-Person",
-        },
-        inplace=True,
+    # Create summary table straight from the wide rows, which are already
+    # ranked by descending total enrollment; rename and cast in one chain
+    summary_table = (
+        chart_data.loc[
+            :, ["Institution", "Sector", "Total_Enrollment", *ENROLLMENT_TYPES]
+        ]
+        .rename(
+            columns={
+                "Total_Enrollment": "Total Enrollment",
+                "Exclusively Distance Education": "Exclusive DE",
+                "Some Distance Education": "Some DE",
+                "In-Person Only": "In-Person",
+            }
+        )
+        .astype(
+            dict.fromkeys(
+                ["Total Enrollment", "Exclusive DE", "Some DE", "In-Person"], int
+            )
+        )
     )
 
-    # Format numbers
-    for col in ["Total Enrollment", "Exclusive DE", "Some DE", "In-Person"]:
-        if col in summary_table.columns:
-            summary_table[col] = summary_table[col].astype(int)
-
     render_dataframe(summary_table, width="stretch")
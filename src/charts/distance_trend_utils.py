@@ -0,0 +1,187 @@
+"""Shared data preparation for distance education enrollment trend charts."""
+
+from __future__ import annotations
+
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+from src.charts.metadata_utils import _prepare_metadata
+from src.charts.trend_utils import (
+    _drop_missing_unit_ids,
+    _normalize_unit_ids,
+    _top_n_positions,
+    classify_yoy_direction,
+)
+
+
+def _prepare_distance_trend_dataframe(
+    distance_df: pd.DataFrame,
+    metadata_df: pd.DataFrame,
+    year_columns: List[tuple[int, str]],
+    *,
+    value_name: str,
+    value_label: str,
+    top_n: int,
+    anchor_year: int,
+    include_percentage: bool,
+) -> pd.DataFrame:
+    """Build the long-form top-N trend frame shared by the distance trend charts.
+
+    Args:
+        distance_df: Wide distance education dataset keyed by ``UnitID``.
+        metadata_df: Institution metadata with ``UnitID``, ``institution``, ``sector``.
+        year_columns: ``(year, column)`` pairs for the enrollment series to chart.
+        value_name: Name of the enrollment value column in the output.
+        value_label: Human-readable series name used in error messages.
+        top_n: Number of institutions to keep, ranked by anchor-year value.
+        anchor_year: Year used to rank institutions.
+        include_percentage: When True, add ``year_total_enrollment`` and
+            ``de_percentage`` (each institution's share of the top-N total).
+    """
+    if "UnitID" not in distance_df.columns:
+        raise ValueError(
+            "Distance education dataset missing 'UnitID' column required for charting."
+        )
+
+    # Work on just the key and enrollment columns, converted to numeric.
+    # downcast="float" keeps float32 when every value is within pandas'
+    # tolerance (atol=5e-4) of the original, which for whole-number headcounts
+    # means exact; it halves the bytes moved by the merge and filters.
+    field_names = [column for _, column in year_columns]
+    working = distance_df[["UnitID", *field_names]].copy()
+    for column in field_names:
+        working[column] = pd.to_numeric(
+            working[column], errors="coerce", downcast="float"
+        )
+
+    working["UnitID"] = _normalize_unit_ids(working.get("UnitID"))
+    working = _drop_missing_unit_ids(working)
+
+    # Prepare metadata
+    metadata = _prepare_metadata(metadata_df, "distance education")
+
+    # Join names and sectors from the UnitID-indexed metadata
+    merged = working.join(metadata, on="UnitID", how="inner")
+    if merged.empty:
+        return pd.DataFrame()
+
+    # Find anchor year column
+    anchor_col = None
+    for year, col in year_columns:
+        if year == anchor_year:
+            anchor_col = col
+            break
+
+    if anchor_col is None:
+        raise ValueError(f"No {value_label} data found for anchor year {anchor_year}")
+
+    # Get top N institutions by anchor year enrollment
+    anchor_data = merged[merged[anchor_col].notna() & (merged[anchor_col] > 0)]
+    if anchor_data.empty:
+        return pd.DataFrame()
+
+    top_positions = _top_n_positions(anchor_data[anchor_col].to_numpy(), top_n)
+    top_unit_ids = anchor_data["UnitID"].to_numpy()[top_positions]
+
+    # Filter to top institutions
+    filtered = merged[merged["UnitID"].isin(top_unit_ids)]
+    if filtered.empty:
+        return pd.DataFrame()
+
+    # Work on the dense institutions x years matrix, one row per institution
+    filtered = filtered.sort_values("UnitID")
+    values = filtered[field_names].to_numpy(dtype=float)
+    n_institutions, n_years = values.shape
+    yoy_percent = _yoy_percent(values)
+
+    # Flatten row-major (institution, then year) to long format, keeping every
+    # reported value (0 is kept so trends show meaningful drops)
+    reported = ~np.isnan(values).ravel()
+    if not reported.any():
+        return pd.DataFrame()
+    rows = np.repeat(np.arange(n_institutions), n_years)[reported]
+    years = np.array([year for year, _ in year_columns], dtype=np.int16)
+
+    # Per-institution columns are cleaned and typed once, then expanded to one
+    # row per reported year by positional take. Arrow-backed strings keep names
+    # in one contiguous buffer instead of one Python object per row.
+    unit_ids = filtered["UnitID"].astype("Int32").array
+    institutions = filtered["institution"].astype("string[pyarrow]").array
+    sectors = filtered["sector"].astype("string[pyarrow]").array
+
+    # Enrollment counts are whole numbers well inside float32's exact range;
+    # percentages stay float64 so their rounded values serialize for Altair
+    # without float32 representation noise.
+    long_form = pd.DataFrame(
+        {
+            "UnitID": unit_ids.take(rows),
+            "Institution": institutions.take(rows),
+            "Sector": sectors.take(rows),
+            "Year": np.tile(years, n_institutions)[reported],
+            value_name: values.ravel()[reported].astype(np.float32),
+        }
+    )
+
+    value_columns = [value_name]
+    if include_percentage:
+        # Total enrollment per year across the top N institutions, and each
+        # institution-year's share of it
+        year_totals = np.nansum(values, axis=0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            shares = np.divide(values, year_totals)
+        shares *= 100
+        np.round(shares, 2, out=shares)
+        shares[:, ~(year_totals > 0)] = 0.0
+        long_form["de_percentage"] = shares.ravel()[reported]
+        long_form["year_total_enrollment"] = np.tile(
+            year_totals.astype(np.float32), n_institutions
+        )[reported]
+        value_columns += ["de_percentage", "year_total_enrollment"]
+
+    long_form["AnchorYear"] = anchor_year
+
+    # Determine change direction for dot coloring (based on percent change).
+    # First years have a 0.0 change and therefore classify as "Same".
+    long_form["YoYChangePercent"] = yoy_percent.ravel()[reported]
+    long_form["ChangeDirection"] = classify_yoy_direction(long_form["YoYChangePercent"])
+
+    final_columns = [
+        "UnitID",
+        "Institution",
+        "Sector",
+        "Year",
+        *value_columns,
+        "AnchorYear",
+        "ChangeDirection",
+        "YoYChangePercent",
+    ]
+    return long_form[final_columns]
+
+
+def _yoy_percent(values: np.ndarray) -> np.ndarray:
+    """Return the rounded year-over-year percent change for an institutions x years matrix.
+
+    Each value is compared with the institution's most recent earlier reported
+    (non-NaN) year, so a missing year is skipped rather than breaking the trend.
+    The change is 0.0 for an institution's first reported year and wherever the
+    previous value is not positive.
+    """
+    n_years = values.shape[1]
+    # Column index of the latest reported year at or before each position
+    last_reported = np.maximum.accumulate(
+        np.where(np.isnan(values), -1, np.arange(n_years)), axis=1
+    )
+    previous_index = np.full_like(last_reported, -1)
+    previous_index[:, 1:] = last_reported[:, :-1]
+    prev = np.take_along_axis(values, np.maximum(previous_index, 0), axis=1)
+    prev[previous_index < 0] = np.nan
+    # Fused in place: one output buffer instead of a temporary per operator
+    change = np.subtract(values, prev)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        np.divide(change, prev, out=change)
+    change *= 100
+    np.round(change, 1, out=change)
+    change[~(prev > 0)] = 0.0
+    return change
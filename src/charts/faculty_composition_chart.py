@@ -10,16 +10,13 @@ from __future__ import annotations
 from dataclasses import dataclass
 
 import altair as alt
+import numpy as np
 import pandas as pd
 import streamlit as st
 
+from src.charts.sector_colors import SECTOR_COLOR_SCALE
 from src.ui.renderers import render_altair_chart, render_dataframe
 
-SECTOR_COLOR_SCALE = alt.Scale(
-    domain=["Public", "Private, not-for-profit", "Private, for-profit", "Unknown"],
-    range=["#2ca02c", "#9467bd", "#1f77b4", "#7f7f7f"],
-)
-
 FOUR_YEAR_SECTORS = (1, 2, 3)
 TWO_YEAR_SECTORS = (4, 5, 6)
 
@@ -72,7 +69,7 @@ def _prepare_faculty_ranking(
     ranked = working.sort_values("pct_parttime", ascending=False)
     # top_n <= 0 means "All" (no limit).
     top = (ranked.head(top_n) if top_n and top_n > 0 else ranked).copy()
-    top["rank"] = range(1, len(top) + 1)
+    top["rank"] = np.arange(1, len(top) + 1, dtype=np.int32)
 
     chart_data = top.rename(columns={"institution": "Institution", "sector": "Sector"})[
         [
@@ -13,13 +13,9 @@ import altair as alt
 import pandas as pd
 import streamlit as st
 
+from src.charts.sector_colors import SECTOR_COLOR_SCALE
 from src.ui.renderers import render_altair_chart, render_dataframe
 
-SECTOR_COLOR_SCALE = alt.Scale(
-    domain=["Public", "Private, not-for-profit", "Private, for-profit", "Unknown"],
-    range=["#2ca02c", "#9467bd", "#1f77b4", "#7f7f7f"],
-)
-
 FOUR_YEAR_SECTORS = (1, 2, 3)
 TWO_YEAR_SECTORS = (4, 5, 6)
 
@@ -6,16 +6,20 @@ from dataclasses import dataclass
 from typing import Optional
 
 import altair as alt
+import numpy as np
 import pandas as pd
 import streamlit as st
 
-from src.charts.trend_utils import _identify_year_columns, _normalize_unit_ids
-from src.ui.renderers import render_altair_chart, render_dataframe
-
-SECTOR_COLOR_SCALE = alt.Scale(
-    domain=["Public", "Private, not-for-profit", "Private, for-profit", "Unknown"],
-    range=["#2ca02c", "#9467bd", "#1f77b4", "#7f7f7f"],
+from src.charts.metadata_utils import _prepare_metadata
+from src.charts.sector_colors import SECTOR_COLOR_SCALE
+from src.charts.trend_utils import (
+    _drop_missing_unit_ids,
+    _normalize_unit_ids,
+    _top_dollar_year_table,
+    _top_n_positions,
 )
+from src.core.year_columns import identify_year_columns
+from src.ui.renderers import render_altair_chart, render_dataframe
 
 
 @dataclass(frozen=True)
@@ -43,51 +47,43 @@ def _prepare_top_dollar_dataframe(
             requested_top_n=top_n,
         )
 
-    year_columns = _identify_year_columns(loans_df.columns)
+    year_columns = identify_year_columns(loans_df.columns)
     if not year_columns:
         raise ValueError(
             "No year columns found in loan dataset (expected columns named like 'YR2022')."
         )
 
-    working = loans_df.copy()
-    if "UnitID" not in working.columns:
+    if "UnitID" not in loans_df.columns:
         raise ValueError("Loan dataset missing 'UnitID' column required for charting.")
     year_field_names = [column for _, column in year_columns]
-    for column in year_field_names:
-        working[column] = pd.to_numeric(working[column], errors="coerce")
+    # Keep only the key, year columns and the fallback Institution name
+    working_columns = ["UnitID", *year_field_names]
+    if "Institution" in loans_df.columns:
+        working_columns.append("Institution")
+    # .loc already returns a new frame, not a flagged slice, so no copy is needed
+    working = loans_df.loc[:, working_columns]
+    # Coerced in one block assignment rather than one column insert per year.
+    # pandas downcasts to float32 only when every value is within an absolute
+    # 5e-4 of the original. Loan totals are whole dollars, so that is exact:
+    # any total float32 cannot hold is off by at least $1 and keeps float64.
+    working[year_field_names] = working[year_field_names].apply(
+        pd.to_numeric, errors="coerce", downcast="float"
+    )
 
     working["UnitID"] = _normalize_unit_ids(working.get("UnitID"))
-    metadata = metadata_df.copy()
-    required_metadata = {"UnitID", "institution", "sector"}
-    missing_metadata = [
-        column for column in required_metadata if column not in metadata.columns
-    ]
-    if missing_metadata:
-        raise ValueError(
-            "Cannot merge loan dataset with metadata. Missing columns: "
-            + ", ".join(sorted(missing_metadata))
-        )
-    metadata["UnitID"] = _normalize_unit_ids(metadata.get("UnitID"))
-    metadata["sector"] = metadata["sector"].astype("string")
-
-    merged = pd.merge(
-        working,
-        metadata[["UnitID", "institution", "sector"]],
-        on="UnitID",
-        how="inner",
+    working = _drop_missing_unit_ids(working)
+    metadata = _prepare_metadata(metadata_df, "loan")
+
+    # Rank before joining metadata so the join only touches the top N rows.
+    # Restricting to UnitIDs that have metadata first keeps the ranking the
+    # same as ranking the merged frame.
+    # One contiguous float64 block; float32 would lose whole-dollar precision
+    working["loan_dollars"] = np.nansum(
+        working[year_field_names].to_numpy(dtype=np.float64), axis=1
     )
-    if merged.empty:
-        empty = pd.DataFrame()
-        return LoanTopDollarResult(
-            period_label=None,
-            chart_data=empty,
-            table_data=empty,
-            sector_summary=empty,
-            requested_top_n=top_n,
-        )
-
-    merged["loan_dollars"] = merged[year_field_names].sum(axis=1, skipna=True)
-    trimmed = merged[merged["loan_dollars"] > 0].copy()
+    trimmed = working[
+        working["UnitID"].isin(metadata.index) & (working["loan_dollars"] > 0)
+    ]
     if trimmed.empty:
         empty = pd.DataFrame()
         return LoanTopDollarResult(
@@ -98,29 +94,39 @@ def _prepare_top_dollar_dataframe(
             requested_top_n=top_n,
         )
 
-    trimmed["Institution"] = trimmed["institution"].where(
-        trimmed["institution"].notna() & (trimmed["institution"].astype(str) != ""),
-        trimmed.get("Institution"),
+    top = (
+        trimmed.iloc[_top_n_positions(trimmed["loan_dollars"].to_numpy(), top_n)]
+        .join(metadata, on="UnitID", how="inner")
+        .reset_index(drop=True)
     )
-    trimmed["Institution"] = trimmed["Institution"].fillna("")
-    trimmed["sector"] = trimmed["sector"].fillna("Unknown").replace("", "Unknown")
+    # Prefer the metadata name; fall back to the dataset's own name when blank
+    names = top["institution"].fillna("")
+    top["Institution"] = names.mask(names == "", top.get("Institution", "")).fillna("")
 
-    top = trimmed.sort_values("loan_dollars", ascending=False).head(top_n).copy()
-    top["rank"] = range(1, len(top) + 1)
+    # _top_n_positions already yields descending loan dollars
+    top["rank"] = np.arange(1, len(top) + 1, dtype=np.int32)
     top["loan_dollars_billions"] = top["loan_dollars"] / 1_000_000_000
 
     chart_data = top[
         ["rank", "Institution", "sector", "loan_dollars_billions", "loan_dollars"]
-    ].copy()
-    chart_data.rename(columns={"sector": "Sector"}, inplace=True)
-
-    sector_summary = (
-        top.groupby("sector", as_index=False)["loan_dollars"]
-        .sum()
-        .rename(columns={"sector": "Sector"})
+    ].rename(columns={"sector": "Sector"})
+
+    # At most a handful of sectors: sum over the categorical codes with
+    # bincount rather than setting up a groupby, keeping only sectors present
+    sectors = top["sector"].array
+    counts = np.bincount(sectors.codes, minlength=len(sectors.categories))
+    sector_dollars = np.bincount(
+        sectors.codes,
+        weights=top["loan_dollars"].to_numpy(),
+        minlength=len(sectors.categories),
     )
-    sector_summary["loan_dollars_billions"] = (
-        sector_summary["loan_dollars"] / 1_000_000_000
+    present = counts > 0
+    sector_summary = pd.DataFrame(
+        {
+            "Sector": sectors.categories[present],
+            "loan_dollars": sector_dollars[present],
+            "loan_dollars_billions": sector_dollars[present] / 1_000_000_000,
+        }
     )
     sector_summary = sector_summary.sort_values("loan_dollars", ascending=False)
     total_loans = sector_summary["loan_dollars"].sum()
@@ -132,55 +138,7 @@ def _prepare_top_dollar_dataframe(
         sector_summary["share_pct"] = 0.0
     sector_summary["label_mid"] = sector_summary["loan_dollars_billions"] / 2
 
-    id_vars = [
-        "UnitID",
-        "Institution",
-        "sector",
-        "loan_dollars",
-        "loan_dollars_billions",
-        "rank",
-    ]
-    year_data = top[id_vars + year_field_names].melt(
-        id_vars=id_vars,
-        value_vars=year_field_names,
-        var_name="year_column",
-        value_name="year_loan_dollars",
-    )
-    year_data = year_data[
-        year_data["year_loan_dollars"].notna() & (year_data["year_loan_dollars"] > 0)
-    ]
-    if year_data.empty:
-        table_data = pd.DataFrame()
-    else:
-        year_data["year"] = (
-            year_data["year_column"].str.extract(r"YR(\d{4})")[0].astype(int)
-        )
-        year_data["year_loan_dollars_billions"] = (
-            year_data["year_loan_dollars"] / 1_000_000_000
-        )
-        year_data["loan_dollars_billions"] = year_data["loan_dollars"] / 1_000_000_000
-        year_data = year_data.sort_values(
-            ["loan_dollars", "year"], ascending=[False, True]
-        )
-
-        table = year_data.pivot_table(
-            index=["Institution", "sector", "loan_dollars_billions"],
-            columns="year",
-            values="year_loan_dollars_billions",
-            aggfunc="sum",
-            fill_value=0,
-        ).reset_index()
-        table = table.sort_values("loan_dollars_billions", ascending=False)
-        table.rename(
-            columns={"sector": "Sector", "loan_dollars_billions": "Total (billions)"},
-            inplace=True,
-        )
-        year_cols = [col for col in table.columns if isinstance(col, (int, float))]
-        for col in year_cols:
-            table[col] = table[col].round(3)
-        table["Total (billions)"] = table["Total (billions)"].round(2)
-        table.columns = [str(col) for col in table.columns]
-        table_data = table
+    table_data = _top_dollar_year_table(top, year_columns, "loan_dollars_billions")
 
     min_year = year_columns[0][0]
     max_year = year_columns[-1][0]
@@ -214,16 +172,18 @@ def render_loan_top_dollars_chart(
         st.warning("No federal loan information available to chart.")
         return
 
-    chart_data = prepared.chart_data.copy().sort_values("loan_dollars", ascending=False)
-    chart_data["Institution"] = pd.Categorical(
-        chart_data["Institution"], categories=chart_data["Institution"], ordered=True
+    # Prepared rows are already ranked by descending loan dollars
+    institutions = prepared.chart_data["Institution"]
+    chart_data = prepared.chart_data.assign(
+        Institution=pd.Categorical(institutions, categories=institutions, ordered=True)
     )
 
     period_suffix = f" ({prepared.period_label})" if prepared.period_label else ""
     chart_title = f"{title}{period_suffix}"
 
-    # Calculate number of unique institutions for height
-    num_institutions = chart_data["Institution"].nunique()
+    # Number of unique institutions, reused for chart height and caption;
+    # the categories are the distinct ranked names, so no hashing pass is needed
+    num_institutions = len(chart_data["Institution"].cat.categories)
 
     base = alt.Chart(chart_data).encode(
         y=alt.Y(
@@ -289,12 +249,11 @@ def render_loan_top_dollars_chart(
 
     st.subheader(chart_title)
     period_text = prepared.period_label or "the available years"
-    num_institutions_display = chart_data["Institution"].nunique()
     selection_note = ""
-    if num_institutions_display < prepared.requested_top_n:
-        selection_note = f" (requested Top {prepared.requested_top_n}, data available for {num_institutions_display})"
+    if num_institutions < prepared.requested_top_n:
+        selection_note = f" (requested Top {prepared.requested_top_n}, data available for {num_institutions})"
     st.caption(
-        f"Top {num_institutions_display} institutions by federal loan dollars across {period_text}{selection_note}. "
+        f"Top {num_institutions} institutions by federal loan dollars across {period_text}{selection_note}. "
         "Bars show total loan portfolios, colored by sector."
     )
     render_altair_chart(chart)
@@ -3,10 +3,19 @@
 from __future__ import annotations
 
 import altair as alt
+import numpy as np
 import pandas as pd
 import streamlit as st
 
-from src.charts.trend_utils import _identify_year_columns, _normalize_unit_ids
+from src.charts.metadata_utils import _prepare_metadata
+from src.charts.trend_utils import (
+    _drop_missing_unit_ids,
+    _normalize_unit_ids,
+    _sorted_yoy_percent,
+    _top_n_positions,
+    classify_yoy_direction,
+)
+from src.core.year_columns import identify_year_columns
 from src.ui.renderers import render_altair_chart, render_dataframe
 
 
@@ -20,110 +29,85 @@ def _prepare_loan_trend_dataframe(
     if loans_df.empty:
         return pd.DataFrame(), None
 
-    year_info = _identify_year_columns(loans_df.columns)
+    year_info = identify_year_columns(loans_df.columns)
     if not year_info:
         raise ValueError(
             "No year columns found in loan dataset (expected headers like 'YR2022')."
         )
 
-    working = loans_df.copy()
-    if "UnitID" not in working.columns:
+    if "UnitID" not in loans_df.columns:
         raise ValueError(
             "Loan dataset missing 'UnitID' column required for trend charting."
         )
 
     year_columns = [column for _, column in year_info]
-    for column in year_columns:
-        working[column] = pd.to_numeric(working[column], errors="coerce")
+    # Only the key and year columns are needed; .loc already returns a new
+    # frame (not a flagged slice), and the year block is coerced in one assignment
+    working = loans_df.loc[:, ["UnitID", *year_columns]]
+    working[year_columns] = working[year_columns].apply(pd.to_numeric, errors="coerce")
     working["UnitID"] = _normalize_unit_ids(working.get("UnitID"))
+    working = _drop_missing_unit_ids(working)
 
-    required_metadata = {"UnitID", "institution", "sector"}
-    missing_metadata = [
-        column for column in required_metadata if column not in metadata_df.columns
-    ]
-    if missing_metadata:
-        raise ValueError(
-            "Cannot prepare loan trend dataset. Missing metadata columns: "
-            + ", ".join(sorted(missing_metadata))
-        )
-
-    metadata = metadata_df.copy()
-    metadata["UnitID"] = _normalize_unit_ids(metadata.get("UnitID"))
-    metadata["institution"] = metadata["institution"].astype("string")
-    metadata["sector"] = metadata["sector"].astype("string")
-
-    merged = pd.merge(
-        working,
-        metadata[["UnitID", "institution", "sector"]],
-        on="UnitID",
-        how="inner",
-    )
+    # Join names and sectors from the cached UnitID-indexed metadata, which
+    # also validates the required metadata columns
+    metadata = _prepare_metadata(metadata_df, "loan")
+    merged = working.join(metadata, on="UnitID", how="inner")
     if merged.empty:
         return pd.DataFrame(), None
 
-    long_form = merged.melt(
+    # Rank on the wide frame so only the top N institutions are melted. The
+    # anchor is the latest year any institution reports.
+    year_values = merged[year_columns].to_numpy(dtype=float)
+    reported = ~np.isnan(year_values)
+    reported_years = np.flatnonzero(reported.any(axis=0))
+    if reported_years.size == 0:
+        return pd.DataFrame(), None
+    anchor_position = reported_years[-1]
+    anchor_year = year_info[anchor_position][0]
+
+    # Partial selection over the institutions reporting in the anchor year
+    candidates = np.flatnonzero(reported[:, anchor_position])
+    top_positions = candidates[
+        _top_n_positions(year_values[candidates, anchor_position], top_n)
+    ]
+    top_ids = merged["UnitID"].array[top_positions]
+    top = merged[merged["UnitID"].isin(top_ids)]
+
+    # The melt repeats names once per year column; as a categorical (sector
+    # already is one) that copies integer codes instead of strings
+    filtered = top.astype({"institution": "category"}).melt(
         id_vars=["UnitID", "institution", "sector"],
         value_vars=year_columns,
         var_name="YearLabel",
         value_name="loan_dollars",
     )
-
-    long_form["loan_dollars"] = pd.to_numeric(
-        long_form["loan_dollars"], errors="coerce"
-    )
-    long_form.dropna(subset=["loan_dollars"], inplace=True)
-    if long_form.empty:
-        return pd.DataFrame(), None
-
-    long_form["Year"] = long_form["YearLabel"].str.extract(r"(\d{4})").astype(float)
-    long_form.dropna(subset=["Year"], inplace=True)
-    if long_form.empty:
+    filtered.dropna(subset=["loan_dollars"], inplace=True)
+    if filtered.empty:
         return pd.DataFrame(), None
 
-    long_form["Year"] = long_form["Year"].astype(int)
-
-    anchor_year = int(long_form["Year"].max()) if not long_form.empty else None
-    if anchor_year is not None:
-        anchor_subset = long_form[long_form["Year"] == anchor_year]
-        anchor_subset = anchor_subset.sort_values("loan_dollars", ascending=False)
-        top_ids = (
-            anchor_subset.dropna(subset=["loan_dollars"])["UnitID"].head(top_n).tolist()
-        )
-        filtered = long_form[long_form["UnitID"].isin(top_ids)].copy()
-        if filtered.empty:
-            return pd.DataFrame(), None
-    else:
-        filtered = long_form.copy()
+    # Every melted label is a known year column, so map the parsed years
+    # (stored as int16, as the distance trends do)
+    year_by_column = {column: year for year, column in year_info}
+    filtered["Year"] = filtered["YearLabel"].map(year_by_column).astype("int16")
 
     filtered["Institution"] = filtered["institution"].astype(str)
-    filtered["Sector"] = filtered["sector"].fillna("Unknown").replace("", "Unknown")
+    # Missing and blank sectors are already "Unknown" in the prepared metadata
+    filtered["Sector"] = filtered["sector"].astype("string")
     filtered["LoanDollarsBillions"] = filtered["loan_dollars"] / 1_000_000_000
     filtered["AnchorYear"] = anchor_year
 
-    # Calculate year-over-year changes for dot coloring
+    # Calculate year-over-year changes for dot coloring on the rows sorted by
+    # institution then year; first years get 0.0 and classify as "Same"
     filtered = filtered.sort_values(["UnitID", "Year"])
-    filtered["PrevYearLoanDollars"] = filtered.groupby("UnitID")["loan_dollars"].shift(
-        1
+    filtered["YoYChangePercent"] = _sorted_yoy_percent(
+        filtered["UnitID"].to_numpy(), filtered["loan_dollars"].to_numpy()
     )
-    filtered["YoYChange"] = filtered["loan_dollars"] - filtered["PrevYearLoanDollars"]
-    filtered["YoYChangePercent"] = (
-        (filtered["loan_dollars"] - filtered["PrevYearLoanDollars"])
-        / filtered["PrevYearLoanDollars"]
-        * 100
-    ).round(1)
 
     # Determine change direction for dot coloring (based on percent change)
-    from src.charts.trend_utils import classify_yoy_direction
-
     filtered["ChangeDirection"] = classify_yoy_direction(filtered["YoYChangePercent"])
 
-    # For first year of each institution, mark as "Same" since no previous year
-    first_year_mask = filtered["PrevYearLoanDollars"].isna()
-    filtered.loc[first_year_mask, "ChangeDirection"] = "Same"
-    filtered.loc[first_year_mask, "YoYChangePercent"] = 0.0
-
     filtered.drop(
-        columns=["YearLabel", "loan_dollars", "PrevYearLoanDollars", "YoYChange"],
+        columns=["YearLabel", "loan_dollars"],
         inplace=True,
         errors="ignore",
     )
@@ -164,8 +148,12 @@ def render_loan_trend_chart(
         st.warning("No federal loan trend data available to chart.")
         return
 
+    # The chart only encodes these fields; UnitID (kept for the table) and
+    # AnchorYear would otherwise be serialized for every point
+    chart_data = prepared.drop(columns=["UnitID", "AnchorYear"])
+
     # Create institution-based color scale
-    institutions = prepared["Institution"].unique()
+    institutions = chart_data["Institution"].unique()
     institution_color_scale = alt.Scale(domain=list(institutions), scheme="category20")
 
     # Create change direction color scale for dots
@@ -176,7 +164,7 @@ def render_loan_trend_chart(
 
     # Line layer with dotted lines colored by institution
     lines = (
-        alt.Chart(prepared)
+        alt.Chart(chart_data)
         .mark_line(strokeDash=[3, 3], point=False)  # Dotted line pattern
         .encode(
             x=alt.X("Year:Q", title="Year", axis=alt.Axis(format="d")),
@@ -202,7 +190,7 @@ def render_loan_trend_chart(
 
     # Point layer with year-over-year change coloring
     points = (
-        alt.Chart(prepared)
+        alt.Chart(chart_data)
         .mark_circle(size=80)
         .encode(
             x=alt.X("Year:Q"),
@@ -251,17 +239,19 @@ def render_loan_trend_chart(
     # Build summary table (year-by-year billons + total)
     year_columns = sorted(prepared["Year"].unique())
     if year_columns:
-        table = prepared.pivot_table(
-            index=["Institution", "Sector"],
-            columns="Year",
-            values="LoanDollarsBillions",
-            aggfunc="sum",
-            fill_value=0,
-        ).reset_index()
+        # One value per (UnitID, Year), so a plain unstack replaces the
+        # pivot_table aggregation; UnitID keeps same-named institutions apart
+        table = (
+            prepared.set_index(["UnitID", "Institution", "Sector", "Year"])[
+                "LoanDollarsBillions"
+            ]
+            .unstack("Year", fill_value=0)
+            .reset_index()
+            .drop(columns="UnitID")
+        )
         table["Total (billions)"] = table[year_columns].sum(axis=1)
-        table["Total (billions)"] = table["Total (billions)"].round(2)
-        for col in year_columns:
-            table[col] = table[col].round(2)
+        # Round every numeric column in one pass
+        table = table.round(dict.fromkeys([*year_columns, "Total (billions)"], 2))
         display_columns = (
             ["Institution", "Sector"] + year_columns + ["Total (billions)"]
         )
@@ -3,13 +3,42 @@
 from __future__ import annotations
 
 import altair as alt
+import numpy as np
 import pandas as pd
 import streamlit as st
 
-from src.charts.loan_top_dollars_chart import SECTOR_COLOR_SCALE
-from src.charts.trend_utils import _identify_year_columns, _normalize_unit_ids
+from src.charts.sector_colors import SECTOR_COLOR_SCALE
+from src.charts.trend_utils import (
+    _drop_missing_unit_ids,
+    _normalize_unit_ids,
+    _top_n_positions,
+)
+from src.core.year_columns import identify_year_columns
 from src.ui.renderers import render_altair_chart, render_dataframe
 
+GRAD_METADATA_COLUMNS = [
+    "UnitID",
+    "institution",
+    "sector",
+    "graduation_rate",
+    "enrollment",
+]
+
+
+@st.cache_data(show_spinner=False)
+def _index_grad_metadata(metadata_df: pd.DataFrame) -> pd.DataFrame:
+    """Return institution, sector, graduation rate and enrollment indexed by ``UnitID``."""
+    metadata = metadata_df.loc[:, GRAD_METADATA_COLUMNS]
+    metadata["UnitID"] = _normalize_unit_ids(metadata["UnitID"])
+    metadata = _drop_missing_unit_ids(metadata)
+    metadata["graduation_rate"] = pd.to_numeric(
+        metadata["graduation_rate"], errors="coerce"
+    )
+    metadata["enrollment"] = pd.to_numeric(metadata["enrollment"], errors="coerce")
+    metadata["sector"] = metadata["sector"].astype("string")
+    metadata["institution"] = metadata["institution"].astype("string")
+    return metadata.set_index("UnitID")
+
 
 @st.cache_data(show_spinner=False)
 def _prepare_loan_vs_grad_dataframe(
@@ -21,21 +50,14 @@ def _prepare_loan_vs_grad_dataframe(
     if loans_df.empty:
         return pd.DataFrame(), None
 
-    year_columns = _identify_year_columns(loans_df.columns)
+    year_columns = identify_year_columns(loans_df.columns)
     if not year_columns:
         raise ValueError(
             "No year columns found in loan dataset (expected columns named like 'YR2022')."
         )
 
-    required_metadata = {
-        "UnitID",
-        "institution",
-        "sector",
-        "graduation_rate",
-        "enrollment",
-    }
     missing_metadata = [
-        column for column in required_metadata if column not in metadata_df.columns
+        column for column in GRAD_METADATA_COLUMNS if column not in metadata_df.columns
     ]
     if missing_metadata:
         raise ValueError(
@@ -43,41 +65,38 @@ def _prepare_loan_vs_grad_dataframe(
             + ", ".join(sorted(missing_metadata))
         )
 
-    working = loans_df.copy()
-    if "UnitID" not in working.columns:
+    if "UnitID" not in loans_df.columns:
         raise ValueError("Loan dataset missing 'UnitID' column required for charting.")
 
     numeric_year_columns = [column for _, column in year_columns]
-    for column in numeric_year_columns:
-        working[column] = pd.to_numeric(working[column], errors="coerce")
+    # Prune both sides to the join key and the columns used afterwards, so
+    # the merge does not carry unused loan or metadata columns
+    working = loans_df.loc[:, ["UnitID", *numeric_year_columns]]
+    # Coerced in one block assignment rather than one column insert per year
+    working[numeric_year_columns] = working[numeric_year_columns].apply(
+        pd.to_numeric, errors="coerce"
+    )
 
     working["UnitID"] = _normalize_unit_ids(working["UnitID"])
+    working = _drop_missing_unit_ids(working)
 
-    metadata = metadata_df.copy()
-    metadata["UnitID"] = _normalize_unit_ids(metadata["UnitID"])
-    metadata["graduation_rate"] = pd.to_numeric(
-        metadata["graduation_rate"], errors="coerce"
-    )
-    metadata["enrollment"] = pd.to_numeric(metadata["enrollment"], errors="coerce")
-    metadata["sector"] = metadata["sector"].astype("string")
-    metadata["institution"] = metadata["institution"].astype("string")
-
-    merged = pd.merge(
-        working,
-        metadata[["UnitID", "institution", "sector", "graduation_rate", "enrollment"]],
-        on="UnitID",
-        how="inner",
-    )
+    # Join names, sectors and graduation fields from the cached UnitID-indexed
+    # metadata instead of re-coercing and re-hashing it on every call
+    merged = working.join(_index_grad_metadata(metadata_df), on="UnitID", how="inner")
     if merged.empty:
         return pd.DataFrame(), None
 
-    merged["loan_dollars"] = merged[numeric_year_columns].sum(axis=1, skipna=True)
+    # One contiguous float64 block; missing years are skipped in the total
+    merged["loan_dollars"] = np.nansum(
+        merged[numeric_year_columns].to_numpy(dtype=np.float64), axis=1
+    )
+    # NaN never compares greater than zero, so the enrollment test also
+    # drops missing enrollment without a separate notna() pass
     filtered = merged[
         (merged["loan_dollars"] > 0)
         & merged["graduation_rate"].notna()
-        & merged["enrollment"].notna()
         & (merged["enrollment"] > 0)
-    ].copy()
+    ]
     if filtered.empty:
         return pd.DataFrame(), None
 
@@ -85,17 +104,24 @@ def _prepare_loan_vs_grad_dataframe(
     max_year = year_columns[-1][0]
     period_label = f"{min_year}-{max_year}" if min_year != max_year else str(min_year)
 
-    filtered["Institution"] = filtered["institution"].fillna("")
-    filtered["Sector"] = filtered["sector"].fillna("Unknown").replace("", "Unknown")
-    filtered["loan_dollars_billions"] = filtered["loan_dollars"] / 1_000_000_000
-    filtered["graduation_rate"] = filtered["graduation_rate"].astype(float)
-    filtered["enrollment"] = filtered["enrollment"].astype(float)
-    filtered["YearsCovered"] = period_label
-
-    top_filtered = (
-        filtered.sort_values("loan_dollars_billions", ascending=False)
-        .head(top_n)
-        .copy()
+    # Partial selection of the top N instead of sorting every institution
+    top = filtered.iloc[_top_n_positions(filtered["loan_dollars"].to_numpy(), top_n)]
+
+    # Keep only the fields the chart and table show, so the year columns and
+    # raw metadata are neither cached nor serialized with the chart. Missing
+    # and blank sectors become "Unknown" in one masked pass.
+    sector = top["sector"]
+    top_filtered = pd.DataFrame(
+        {
+            "Institution": top["institution"].fillna(""),
+            "Sector": sector.mask(sector.isna() | (sector == ""), "Unknown").astype(
+                "category"
+            ),
+            "YearsCovered": period_label,
+            "loan_dollars": top["loan_dollars"],
+            "graduation_rate": top["graduation_rate"].astype(float),
+            "enrollment": top["enrollment"].astype(float),
+        }
     )
     return top_filtered, period_label
 
@@ -125,8 +151,10 @@ def render_loan_vs_grad_scatter(
         )
         return
 
+    # Billions are derived in the chart from the dollars already in the data
     scatter = (
         alt.Chart(prepared)
+        .transform_calculate(loan_dollars_billions="datum.loan_dollars / 1000000000")
         .mark_circle(opacity=0.75)
         .encode(
             x=alt.X(
@@ -183,31 +211,39 @@ def render_loan_vs_grad_scatter(
     )
     render_altair_chart(scatter + grad_guides)
 
+    # One chain: rescale and round the renamed columns without rebinding them
     table = (
-        prepared[
+        prepared.loc[
+            :,
             [
                 "Institution",
                 "Sector",
                 "YearsCovered",
-                "loan_dollars_billions",
+                "loan_dollars",
                 "graduation_rate",
                 "enrollment",
-            ]
+            ],
         ]
-        .copy()
         .rename(
             columns={
                 "YearsCovered": "Years",
-                "loan_dollars_billions": "Loan dollars (billions)",
+                "loan_dollars": "Loan dollars (billions)",
                 "graduation_rate": "Graduation rate (%)",
                 "enrollment": "Enrollment",
             }
         )
         .sort_values("Loan dollars (billions)", ascending=False)
+        .assign(
+            **{
+                "Loan dollars (billions)": lambda d: d["Loan dollars (billions)"]
+                / 1_000_000_000
+            }
+        )
+        .round(
+            {"Loan dollars (billions)": 2, "Graduation rate (%)": 1, "Enrollment": 0}
+        )
+        .astype({"Enrollment": int})
     )
-    table["Loan dollars (billions)"] = table["Loan dollars (billions)"].round(2)
-    table["Graduation rate (%)"] = table["Graduation rate (%)"].round(1)
-    table["Enrollment"] = table["Enrollment"].round().astype(int)
 
     st.markdown("**Institutions (top loan totals)**")
     render_dataframe(table, width="stretch")
@@ -0,0 +1,45 @@
+"""Shared institution metadata preparation for chart merges."""
+
+from __future__ import annotations
+
+import pandas as pd
+import streamlit as st
+
+from src.charts.trend_utils import _drop_missing_unit_ids, _normalize_unit_ids
+
+METADATA_COLUMNS = ["UnitID", "institution", "sector"]
+
+
+@st.cache_data(show_spinner=False)
+def _prepare_metadata(metadata_df: pd.DataFrame, dataset_label: str) -> pd.DataFrame:
+    """Return institution and sector indexed by ``UnitID``, ready to ``join`` on.
+
+    UnitIDs become a unique plain int32 index (rows without one are dropped) and
+    sector is a categorical with missing or blank values mapped to ``"Unknown"``.
+    Cached so every chart on a page shares one normalization of the same
+    metadata frame.
+
+    Args:
+        metadata_df: Institution metadata with ``UnitID``, ``institution``, ``sector``.
+        dataset_label: Name of the dataset being merged, used in error messages.
+    """
+    missing_metadata = [
+        column for column in METADATA_COLUMNS if column not in metadata_df.columns
+    ]
+    if missing_metadata:
+        raise ValueError(
+            f"Cannot merge {dataset_label} dataset with metadata. Missing columns: "
+            + ", ".join(sorted(missing_metadata))
+        )
+    metadata = metadata_df[METADATA_COLUMNS].copy()
+    metadata["UnitID"] = _normalize_unit_ids(metadata["UnitID"])
+    metadata = _drop_missing_unit_ids(metadata)
+    sector = metadata["sector"].astype("string").fillna("")
+    metadata["sector"] = sector.where(sector != "", "Unknown").astype("category")
+    metadata = metadata.set_index("UnitID")
+    if not metadata.index.is_unique:
+        raise ValueError(
+            f"Cannot merge {dataset_label} dataset with metadata. "
+            "Metadata has duplicate UnitIDs."
+        )
+    return metadata
@@ -5,15 +5,60 @@ from __future__ import annotations
 from typing import Optional
 
 import altair as alt
+import numpy as np
 import pandas as pd
 import streamlit as st
 
+from src.charts.sector_colors import SECTOR_COLOR_SCALE
 from src.ui.renderers import render_altair_chart, render_dataframe
 
-SECTOR_COLOR_SCALE = alt.Scale(
-    domain=["Public", "Private, not-for-profit", "Private, for-profit", "Unknown"],
-    range=["#2ca02c", "#9467bd", "#1f77b4", "#7f7f7f"],
-)
+PREPARED_COLUMNS = [
+    "Institution",
+    "State",
+    "Sector",
+    "PellGraduationRate",
+    "PellDollars",
+    "Enrollment",
+]
+
+
+@st.cache_data(show_spinner=False)
+def _prepare_pell_grad_rate_dataframe(df: pd.DataFrame) -> pd.DataFrame:
+    """Return rows with numeric Pell data and positive enrollment, largest Pell dollars first."""
+
+    # Work on just the columns used below; .loc returns a new frame, so the
+    # rest of the input is never copied
+    working = df.loc[:, [col for col in PREPARED_COLUMNS if col in df.columns]]
+
+    # Convert the numeric columns that are present in one block assignment
+    numeric_columns = [
+        col
+        for col in ("PellGraduationRate", "PellDollars", "Enrollment")
+        if col in working.columns
+    ]
+    working[numeric_columns] = working[numeric_columns].apply(
+        pd.to_numeric, errors="coerce"
+    )
+
+    # Ensure Sector column exists and handle missing values. Every institution
+    # is plotted, so a categorical keeps the few sector labels as codes and
+    # ships them dictionary-encoded to the chart.
+    sector = working.get("Sector", pd.Series(index=working.index, dtype="string"))
+    sector = sector.astype("string").fillna("")
+    working["Sector"] = sector.where(sector != "", "Unknown").astype("category")
+    working["Institution"] = working.get("Institution", "")
+    working["State"] = working.get("State", "")
+
+    # Filter for valid numeric data in one mask over a single float block;
+    # NaN enrollment fails the > 0 test, so it needs no separate check
+    values = working[["PellGraduationRate", "PellDollars", "Enrollment"]].to_numpy(
+        dtype=float, na_value=np.nan
+    )
+    keep = ~np.isnan(values[:, :2]).any(axis=1) & (values[:, 2] > 0)
+    filtered = working[keep]
+
+    # Sort by Pell dollars - show all institutions
+    return filtered.sort_values("PellDollars", ascending=False)
 
 
 def render_pell_grad_rate_scatter(
@@ -34,41 +79,18 @@ def render_pell_grad_rate_scatter(
         st.warning("No data available for this chart.")
         return
 
-    # Create working copy
-    working = df.copy()
-
-    # Convert numeric columns
-    numeric_columns = ["PellGraduationRate", "PellDollars", "Enrollment"]
-    for col in numeric_columns:
-        if col in working.columns:
-            working[col] = pd.to_numeric(working[col], errors="coerce")
-
-    # Convert Pell dollars to billions for display
-    working["PellDollarsBillions"] = working["PellDollars"] / 1_000_000_000
-
-    # Ensure Sector column exists and handle missing values
-    working["Sector"] = (
-        working.get("Sector", "Unknown").fillna("Unknown").replace("", "Unknown")
-    )
-    working["Institution"] = working.get("Institution", "")
-    working["State"] = working.get("State", "")
-
-    # Filter for valid numeric data
-    filtered = working.dropna(
-        subset=["PellGraduationRate", "PellDollarsBillions", "Enrollment"]
-    )
-    filtered = filtered[filtered["Enrollment"] > 0]
-
-    if filtered.empty:
+    # Cached so reruns with the same data skip the cleaning and sort
+    all_filtered = _prepare_pell_grad_rate_dataframe(df)
+    if all_filtered.empty:
         st.warning("No valid numeric data available for the scatter chart.")
         return
 
-    # Sort by Pell dollars - show all institutions
-    all_filtered = filtered.sort_values("PellDollarsBillions", ascending=False)
-
     # Create the scatter plot with Altair
+    # Every institution is plotted, so billions are derived in the chart from
+    # PellDollars rather than shipped as a second dollar column
     scatter = (
         alt.Chart(all_filtered)
+        .transform_calculate(PellDollarsBillions="datum.PellDollars / 1000000000")
         .mark_circle(opacity=0.75)
         .encode(
             x=alt.X(
@@ -134,25 +156,36 @@ def render_pell_grad_rate_scatter(
         "Institution",
         "State",
         "Sector",
-        "PellDollarsBillions",
+        "PellDollars",
         "PellGraduationRate",
         "Enrollment",
     ]
+    # One chain: rescale and round the renamed columns without rebinding them
     table_df = (
-        top_50_for_table[display_columns]
-        .copy()
+        top_50_for_table.loc[:, display_columns]
         .rename(
             columns={
-                "PellDollarsBillions": "Pell Dollars (Billions)",
+                "PellDollars": "Pell Dollars (Billions)",
                 "PellGraduationRate": "Pell Graduation Rate (%)",
                 "Enrollment": "Enrollment",
             }
         )
         .sort_values("Pell Dollars (Billions)", ascending=False)
+        .assign(
+            **{
+                "Pell Dollars (Billions)": lambda d: d["Pell Dollars (Billions)"]
+                / 1_000_000_000
+            }
+        )
+        .round(
+            {
+                "Pell Dollars (Billions)": 2,
+                "Pell Graduation Rate (%)": 1,
+                "Enrollment": 0,
+            }
+        )
+        .astype({"Enrollment": int})
     )
-    table_df["Pell Dollars (Billions)"] = table_df["Pell Dollars (Billions)"].round(2)
-    table_df["Pell Graduation Rate (%)"] = table_df["Pell Graduation Rate (%)"].round(1)
-    table_df["Enrollment"] = table_df["Enrollment"].round().astype(int)
 
     st.markdown("**Top 50 Institutions by Pell Dollars**")
     render_dataframe(table_df, width="stretch")
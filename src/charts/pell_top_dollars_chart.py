@@ -6,16 +6,20 @@ from dataclasses import dataclass
 from typing import Optional
 
 import altair as alt
+import numpy as np
 import pandas as pd
 import streamlit as st
 
-from src.charts.trend_utils import _identify_year_columns, _normalize_unit_ids
-from src.ui.renderers import render_altair_chart, render_dataframe
-
-SECTOR_COLOR_SCALE = alt.Scale(
-    domain=["Public", "Private, not-for-profit", "Private, for-profit", "Unknown"],
-    range=["#2ca02c", "#9467bd", "#1f77b4", "#7f7f7f"],
+from src.charts.metadata_utils import _prepare_metadata
+from src.charts.sector_colors import SECTOR_COLOR_SCALE
+from src.charts.trend_utils import (
+    _drop_missing_unit_ids,
+    _normalize_unit_ids,
+    _top_dollar_year_table,
+    _top_n_positions,
 )
+from src.core.year_columns import identify_year_columns
+from src.ui.renderers import render_altair_chart, render_dataframe
 
 # Rankings sum award years 2013-2022 only, so Pell totals stay commensurable
 # with the COD loan reports (which begin in 2013) and with institutions whose
@@ -23,6 +27,85 @@ SECTOR_COLOR_SCALE = alt.Scale(
 # Phoenix). The Pell trend charts keep the full 2008-2022 series.
 RANKING_START_YEAR = 2013
 
+# Encodings that do not depend on the data are built once at import; only the
+# chart data, height and title vary per render.
+BAR_Y = alt.Y(
+    "Institution:N",
+    sort=None,
+    title="Institution",
+    axis=alt.Axis(
+        labelFontSize=13,
+        labelFontWeight="bold",
+        titleFontSize=14,
+        titleFontWeight="bold",
+    ),
+)
+BAR_X = alt.X(
+    "pell_dollars_billions:Q",
+    title="Pell grant dollars (billions)",
+    axis=alt.Axis(
+        format=".2f",
+        labelFontSize=12,
+        labelFontWeight="bold",
+        titleFontSize=14,
+        titleFontWeight="bold",
+    ),
+)
+BAR_COLOR = alt.Color("Sector:N", scale=SECTOR_COLOR_SCALE, title="Sector")
+BAR_TOOLTIP = [
+    alt.Tooltip("Institution:N", title="Institution"),
+    alt.Tooltip("Sector:N", title="Sector"),
+    alt.Tooltip(
+        "pell_dollars_billions:Q",
+        title="Total Pell dollars (billions)",
+        format=".2f",
+    ),
+    alt.Tooltip("pell_dollars:Q", title="Total Pell dollars", format=",.0f"),
+    alt.Tooltip("rank:Q", title="Rank"),
+]
+LABEL_X = alt.X("pell_dollars_billions:Q")
+LABEL_TEXT = alt.Text("pell_dollars_billions:Q", format=".2f")
+
+SECTOR_Y = alt.Y(
+    "Sector:N",
+    sort=alt.SortField(field="pell_dollars", order="descending"),
+    title="Sector",
+    axis=alt.Axis(
+        labelFontSize=12,
+        labelFontWeight="bold",
+        titleFontSize=13,
+        titleFontWeight="bold",
+    ),
+)
+SECTOR_X = alt.X(
+    "pell_dollars_billions:Q",
+    title="Pell grant dollars (billions)",
+    axis=alt.Axis(
+        format=".2f",
+        labelFontSize=12,
+        labelFontWeight="bold",
+        titleFontSize=13,
+        titleFontWeight="bold",
+    ),
+)
+SECTOR_COLOR = alt.Color("Sector:N", scale=SECTOR_COLOR_SCALE, legend=None)
+SECTOR_TOOLTIP = [
+    alt.Tooltip("Sector:N", title="Sector"),
+    alt.Tooltip(
+        "pell_dollars_billions:Q",
+        title="Pell dollars (billions)",
+        format=".2f",
+    ),
+    alt.Tooltip("pell_dollars:Q", title="Pell dollars", format=",.0f"),
+    alt.Tooltip("share_pct:Q", title="Share of total (%)", format=".1f"),
+]
+SECTOR_LABEL_Y = alt.Y(
+    "Sector:N",
+    sort=alt.SortField(field="pell_dollars", order="descending"),
+)
+SECTOR_LABEL_X = alt.X("label_mid:Q")
+SECTOR_LABEL_TEXT = alt.Text("label:N")
+
 
 @dataclass(frozen=True)
 class PellTopDollarResult:
@@ -49,53 +132,45 @@ def _prepare_top_dollar_dataframe(
             requested_top_n=top_n,
         )
 
-    year_columns = _identify_year_columns(pell_df.columns)
+    year_columns = identify_year_columns(pell_df.columns)
     year_columns = [item for item in year_columns if item[0] >= RANKING_START_YEAR]
     if not year_columns:
         raise ValueError(
             "No year columns found in Pell dataset (expected columns named like 'YR2022')."
         )
 
-    working = pell_df.copy()
-    if "UnitID" not in working.columns:
+    if "UnitID" not in pell_df.columns:
         raise ValueError("Pell dataset missing 'UnitID' column required for charting.")
 
     year_field_names = [column for _, column in year_columns]
-    for column in year_field_names:
-        working[column] = pd.to_numeric(working[column], errors="coerce")
+    # Keep only the key, ranking years and the fallback Institution name;
+    # .loc already returns a new frame, so no full copy is needed
+    working_columns = ["UnitID", *year_field_names]
+    if "Institution" in pell_df.columns:
+        working_columns.append("Institution")
+    working = pell_df.loc[:, working_columns]
+    # pandas downcasts to float32 only when every value is within an absolute
+    # 5e-4 of the original. Pell amounts are whole dollars, so that is exact:
+    # any amount float32 cannot hold is off by at least $1 and keeps float64.
+    working[year_field_names] = working[year_field_names].apply(
+        pd.to_numeric, errors="coerce", downcast="float"
+    )
 
     working["UnitID"] = _normalize_unit_ids(working.get("UnitID"))
-    metadata = metadata_df.copy()
-    required_metadata = {"UnitID", "institution", "sector"}
-    missing_metadata = [
-        column for column in required_metadata if column not in metadata.columns
-    ]
-    if missing_metadata:
-        raise ValueError(
-            "Cannot merge Pell dataset with metadata. Missing columns: "
-            + ", ".join(sorted(missing_metadata))
-        )
-    metadata["UnitID"] = _normalize_unit_ids(metadata.get("UnitID"))
-    metadata["sector"] = metadata["sector"].astype("string")
-
-    merged = pd.merge(
-        working,
-        metadata[["UnitID", "institution", "sector"]],
-        on="UnitID",
-        how="inner",
+    working = _drop_missing_unit_ids(working)
+    # Shared cached metadata: UnitID index, sector already mapped to "Unknown"
+    metadata = _prepare_metadata(metadata_df, "Pell")
+
+    # Rank before joining metadata so the join only touches the top N rows.
+    # Restricting to UnitIDs that have metadata first keeps the ranking the
+    # same as ranking the merged frame.
+    # One contiguous float64 block; missing years are skipped in the total
+    working["pell_dollars"] = np.nansum(
+        working[year_field_names].to_numpy(dtype=np.float64), axis=1
     )
-    if merged.empty:
-        empty = pd.DataFrame()
-        return PellTopDollarResult(
-            period_label=None,
-            chart_data=empty,
-            table_data=empty,
-            sector_summary=empty,
-            requested_top_n=top_n,
-        )
-
-    merged["pell_dollars"] = merged[year_field_names].sum(axis=1, skipna=True)
-    trimmed = merged[merged["pell_dollars"] > 0].copy()
+    trimmed = working[
+        working["UnitID"].isin(metadata.index) & (working["pell_dollars"] > 0)
+    ]
     if trimmed.empty:
         empty = pd.DataFrame()
         return PellTopDollarResult(
@@ -106,30 +181,31 @@ def _prepare_top_dollar_dataframe(
             requested_top_n=top_n,
         )
 
-    trimmed["Institution"] = trimmed["institution"].where(
-        trimmed["institution"].notna() & (trimmed["institution"].astype(str) != ""),
-        trimmed.get("Institution"),
+    # Partial selection of the top N instead of sorting every institution
+    top = (
+        trimmed.iloc[_top_n_positions(trimmed["pell_dollars"].to_numpy(), top_n)]
+        .join(metadata, on="UnitID", how="inner")
+        .reset_index(drop=True)
     )
-    trimmed["Institution"] = trimmed["Institution"].fillna("")
-    trimmed["sector"] = trimmed["sector"].fillna("Unknown").replace("", "Unknown")
+    # Prefer the metadata name; fall back to the dataset's own name when blank
+    names = top["institution"].fillna("")
+    top["Institution"] = names.mask(names == "", top.get("Institution", "")).fillna("")
 
-    top = trimmed.sort_values("pell_dollars", ascending=False).head(top_n).copy()
-    top["rank"] = range(1, len(top) + 1)
+    top["rank"] = np.arange(1, len(top) + 1, dtype=np.int32)
     top["pell_dollars_billions"] = top["pell_dollars"] / 1_000_000_000
 
     chart_data = top[
         ["rank", "Institution", "sector", "pell_dollars_billions", "pell_dollars"]
-    ].copy()
-    chart_data.rename(columns={"sector": "Sector"}, inplace=True)
+    ].rename(columns={"sector": "Sector"})
 
+    # Billions were scaled once per institution above; sum them alongside
     sector_summary = (
-        top.groupby("sector", as_index=False)["pell_dollars"]
+        top.groupby("sector", as_index=False, observed=True)[
+            ["pell_dollars", "pell_dollars_billions"]
+        ]
         .sum()
         .rename(columns={"sector": "Sector"})
     )
-    sector_summary["pell_dollars_billions"] = (
-        sector_summary["pell_dollars"] / 1_000_000_000
-    )
     sector_summary = sector_summary.sort_values("pell_dollars", ascending=False)
     total_pell = sector_summary["pell_dollars"].sum()
     if total_pell > 0:
@@ -140,55 +216,8 @@ def _prepare_top_dollar_dataframe(
         sector_summary["share_pct"] = 0.0
     sector_summary["label_mid"] = sector_summary["pell_dollars_billions"] / 2
 
-    id_vars = [
-        "UnitID",
-        "Institution",
-        "sector",
-        "pell_dollars",
-        "pell_dollars_billions",
-        "rank",
-    ]
-    year_data = top[id_vars + year_field_names].melt(
-        id_vars=id_vars,
-        value_vars=year_field_names,
-        var_name="year_column",
-        value_name="year_pell_dollars",
-    )
-    year_data = year_data[
-        year_data["year_pell_dollars"].notna() & (year_data["year_pell_dollars"] > 0)
-    ]
-    if year_data.empty:
-        table_data = pd.DataFrame()
-    else:
-        year_data["year"] = (
-            year_data["year_column"].str.extract(r"YR(\d{4})")[0].astype(int)
-        )
-        year_data["year_pell_dollars_billions"] = (
-            year_data["year_pell_dollars"] / 1_000_000_000
-        )
-        year_data["pell_dollars_billions"] = year_data["pell_dollars"] / 1_000_000_000
-        year_data = year_data.sort_values(
-            ["pell_dollars", "year"], ascending=[False, True]
-        )
-
-        table = year_data.pivot_table(
-            index=["Institution", "sector", "pell_dollars_billions"],
-            columns="year",
-            values="year_pell_dollars_billions",
-            aggfunc="sum",
-            fill_value=0,
-        ).reset_index()
-        table = table.sort_values("pell_dollars_billions", ascending=False)
-        table.rename(
-            columns={"sector": "Sector", "pell_dollars_billions": "Total (billions)"},
-            inplace=True,
-        )
-        year_cols = [col for col in table.columns if isinstance(col, (int, float))]
-        for col in year_cols:
-            table[col] = table[col].round(3)
-        table["Total (billions)"] = table["Total (billions)"].round(2)
-        table.columns = [str(col) for col in table.columns]
-        table_data = table
+    # Built straight from the top rows' year matrix, as for loans
+    table_data = _top_dollar_year_table(top, year_columns, "pell_dollars_billions")
 
     min_year = year_columns[0][0]
     max_year = year_columns[-1][0]
@@ -222,60 +251,20 @@ def render_pell_top_dollars_chart(
         st.warning("No Pell grant information available to chart.")
         return
 
-    chart_data = prepared.chart_data.copy().sort_values("pell_dollars", ascending=False)
-    chart_data["Institution"] = pd.Categorical(
-        chart_data["Institution"], categories=chart_data["Institution"], ordered=True
+    # Prepared rows are already ranked by descending Pell dollars
+    institutions = prepared.chart_data["Institution"]
+    chart_data = prepared.chart_data.assign(
+        Institution=pd.Categorical(institutions, categories=institutions, ordered=True)
     )
 
     period_suffix = f" ({prepared.period_label})" if prepared.period_label else ""
     chart_title = f"{title}{period_suffix}"
 
-    num_institutions = chart_data["Institution"].nunique()
-
-    base = alt.Chart(chart_data).encode(
-        y=alt.Y(
-            "Institution:N",
-            sort=None,
-            title="Institution",
-            axis=alt.Axis(
-                labelFontSize=13,
-                labelFontWeight="bold",
-                titleFontSize=14,
-                titleFontWeight="bold",
-            ),
-        )
-    )
-
-    bars = base.mark_bar().encode(
-        x=alt.X(
-            "pell_dollars_billions:Q",
-            title="Pell grant dollars (billions)",
-            axis=alt.Axis(
-                format=".2f",
-                labelFontSize=12,
-                labelFontWeight="bold",
-                titleFontSize=14,
-                titleFontWeight="bold",
-            ),
-        ),
-        color=alt.Color(
-            "Sector:N",
-            scale=SECTOR_COLOR_SCALE,
-            title="Sector",
-        ),
-        tooltip=[
-            alt.Tooltip("Institution:N", title="Institution"),
-            alt.Tooltip("Sector:N", title="Sector"),
-            alt.Tooltip(
-                "pell_dollars_billions:Q",
-                title="Total Pell dollars (billions)",
-                format=".2f",
-            ),
-            alt.Tooltip("pell_dollars:Q", title="Total Pell dollars", format=",.0f"),
-            alt.Tooltip("rank:Q", title="Rank"),
-        ],
-    )
+    # Categories are the distinct ranked names, so no hashing pass is needed
+    num_institutions = len(chart_data["Institution"].cat.categories)
 
+    base = alt.Chart(chart_data).encode(y=BAR_Y)
+    bars = base.mark_bar().encode(x=BAR_X, color=BAR_COLOR, tooltip=BAR_TOOLTIP)
     labels = base.mark_text(
         align="left",
         baseline="middle",
@@ -283,10 +272,7 @@ def render_pell_top_dollars_chart(
         color="#111111",
         fontSize=11,
         fontWeight="bold",
-    ).encode(
-        x=alt.X("pell_dollars_billions:Q"),
-        text=alt.Text("pell_dollars_billions:Q", format=".2f"),
-    )
+    ).encode(x=LABEL_X, text=LABEL_TEXT)
 
     chart = (bars + labels).properties(
         height=max(320, 32 * num_institutions),
@@ -296,12 +282,11 @@ def render_pell_top_dollars_chart(
 
     st.subheader(chart_title)
     period_text = prepared.period_label or "the available years"
-    num_institutions_display = chart_data["Institution"].nunique()
     selection_note = ""
-    if num_institutions_display < prepared.requested_top_n:
-        selection_note = f" (requested Top {prepared.requested_top_n}, data available for {num_institutions_display})"
+    if num_institutions < prepared.requested_top_n:
+        selection_note = f" (requested Top {prepared.requested_top_n}, data available for {num_institutions})"
     st.caption(
-        f"Top {num_institutions_display} institutions by Pell grant dollars across {period_text}{selection_note}. "
+        f"Top {num_institutions} institutions by Pell grant dollars across {period_text}{selection_note}. "
         "Bars show total Pell portfolios, colored by sector."
     )
     render_altair_chart(chart)
@@ -311,43 +296,7 @@ def render_pell_top_dollars_chart(
         sector_chart = (
             alt.Chart(prepared.sector_summary)
             .mark_bar()
-            .encode(
-                y=alt.Y(
-                    "Sector:N",
-                    sort=alt.SortField(field="pell_dollars", order="descending"),
-                    title="Sector",
-                    axis=alt.Axis(
-                        labelFontSize=12,
-                        labelFontWeight="bold",
-                        titleFontSize=13,
-                        titleFontWeight="bold",
-                    ),
-                ),
-                x=alt.X(
-                    "pell_dollars_billions:Q",
-                    title="Pell grant dollars (billions)",
-                    axis=alt.Axis(
-                        format=".2f",
-                        labelFontSize=12,
-                        labelFontWeight="bold",
-                        titleFontSize=13,
-                        titleFontWeight="bold",
-                    ),
-                ),
-                color=alt.Color("Sector:N", scale=SECTOR_COLOR_SCALE, legend=None),
-                tooltip=[
-                    alt.Tooltip("Sector:N", title="Sector"),
-                    alt.Tooltip(
-                        "pell_dollars_billions:Q",
-                        title="Pell dollars (billions)",
-                        format=".2f",
-                    ),
-                    alt.Tooltip("pell_dollars:Q", title="Pell dollars", format=",.0f"),
-                    alt.Tooltip(
-                        "share_pct:Q", title="Share of total (%)", format=".1f"
-                    ),
-                ],
-            )
+            .encode(y=SECTOR_Y, x=SECTOR_X, color=SECTOR_COLOR, tooltip=SECTOR_TOOLTIP)
             .properties(height=320, width=540)
         )
         label_data = prepared.sector_summary[
@@ -362,14 +311,7 @@ def render_pell_top_dollars_chart(
                 align="center",
                 baseline="middle",
             )
-            .encode(
-                y=alt.Y(
-                    "Sector:N",
-                    sort=alt.SortField(field="pell_dollars", order="descending"),
-                ),
-                x=alt.X("label_mid:Q"),
-                text=alt.Text("label:N"),
-            )
+            .encode(y=SECTOR_LABEL_Y, x=SECTOR_LABEL_X, text=SECTOR_LABEL_TEXT)
             .transform_calculate(label="format(datum.share_pct, '.1f') + '%'")
         )
         render_altair_chart(sector_chart + sector_labels)
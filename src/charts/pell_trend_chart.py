@@ -6,13 +6,46 @@ import pandas as pd
 import streamlit as st
 import altair as alt
 
+from src.charts.trend_utils import _sorted_yoy_percent, classify_yoy_direction
 from src.ui.renderers import render_altair_chart, render_dataframe
 
-SECTOR_COLOR_SCALE = alt.Scale(
-    domain=["Public", "Private, not-for-profit", "Private, for-profit", "Unknown"],
-    range=["#2ca02c", "#9467bd", "#1f77b4", "#7f7f7f"],
+# Encodings that do not depend on the data are built once at import; only the
+# institution color scale varies per render.
+CHANGE_COLOR_SCALE = alt.Scale(
+    domain=["Increase", "Same", "Decrease"],
+    range=["#28a745", "#6c757d", "#dc3545"],  # Green, Gray, Red
 )
 
+LINE_X = alt.X("Year:Q", title="Year", axis=alt.Axis(format="d"))
+LINE_Y = alt.Y("PellDollarsBillions:Q", title="Pell dollars (billions)")
+LINE_TOOLTIP = [
+    alt.Tooltip("Institution:N", title="Institution"),
+    alt.Tooltip("Year:Q", title="Year", format=".0f"),
+    alt.Tooltip(
+        "PellDollarsBillions:Q",
+        title="Pell dollars (billions)",
+        format=".2f",
+    ),
+    alt.Tooltip("Sector:N", title="Sector"),
+]
+
+POINT_X = alt.X("Year:Q")
+POINT_Y = alt.Y("PellDollarsBillions:Q")
+POINT_COLOR = alt.Color(
+    "ChangeDirection:N",
+    title="Year-over-Year Change",
+    scale=CHANGE_COLOR_SCALE,
+)
+POINT_TOOLTIP = [
+    *LINE_TOOLTIP,
+    alt.Tooltip(
+        "YoYChangePercent:Q",
+        title="Year-over-year change (%)",
+        format=".1f",
+    ),
+    alt.Tooltip("ChangeDirection:N", title="Change direction"),
+]
+
 
 def render_pell_trend_chart(df: pd.DataFrame, *, title: str) -> None:
     """Render a multi-line trend chart for Pell dollars across years."""
@@ -27,9 +60,9 @@ def render_pell_trend_chart(df: pd.DataFrame, *, title: str) -> None:
         working.get("PellDollarsBillions"), errors="coerce"
     )
     working["Institution"] = working.get("Institution", "").astype(str)
-    working["Sector"] = (
-        working.get("Sector", "Unknown").fillna("Unknown").replace("", "Unknown")
-    )
+    # Missing and blank sectors become "Unknown" in one masked write
+    sector = working.get("Sector", pd.Series("Unknown", index=working.index))
+    working["Sector"] = sector.mask(sector.isna() | (sector == ""), "Unknown")
 
     filtered = working.dropna(subset=["Year", "PellDollarsBillions"])
     if filtered.empty:
@@ -54,73 +87,45 @@ def render_pell_trend_chart(df: pd.DataFrame, *, title: str) -> None:
 
     if anchor_year is not None:
         anchor_subset = filtered[filtered["Year"] == anchor_year]
-        top_institutions = (
+        top_unit_ids = (
             anchor_subset.sort_values("PellDollarsBillions", ascending=False)
             .drop_duplicates(subset=["Institution"], keep="first")
-            .head(10)["Institution"]
-            .tolist()
+            .head(10)["UnitID"]
+            .to_numpy()
         )
-        filtered = filtered[filtered["Institution"].isin(top_institutions)]
+        # Filter on the integer UnitID rather than probing institution names
+        filtered = filtered[filtered["UnitID"].isin(top_unit_ids)]
         if filtered.empty:
             st.warning(
                 "Unable to plot Pell trends because no institutions had positive Pell dollars in the anchor year."
             )
             return
 
-    # Calculate year-over-year changes for dot coloring
+    # Calculate year-over-year changes for dot coloring on the rows sorted by
+    # institution then year; first years get 0.0 and classify as "Same"
     filtered = filtered.sort_values(["UnitID", "Year"])
-    filtered["PrevYearPellDollars"] = filtered.groupby("UnitID")[
-        "PellDollarsBillions"
-    ].shift(1)
-    filtered["YoYChange"] = (
-        filtered["PellDollarsBillions"] - filtered["PrevYearPellDollars"]
+    filtered["YoYChangePercent"] = _sorted_yoy_percent(
+        filtered["UnitID"].to_numpy(), filtered["PellDollarsBillions"].to_numpy()
     )
-    filtered["YoYChangePercent"] = (
-        (filtered["PellDollarsBillions"] - filtered["PrevYearPellDollars"])
-        / filtered["PrevYearPellDollars"]
-        * 100
-    ).round(1)
 
     # Determine change direction for dot coloring (based on percent change)
-    from src.charts.trend_utils import classify_yoy_direction
-
     filtered["ChangeDirection"] = classify_yoy_direction(filtered["YoYChangePercent"])
 
-    # For first year of each institution, mark as "Same" since no previous year
-    first_year_mask = filtered["PrevYearPellDollars"].isna()
-    filtered.loc[first_year_mask, "ChangeDirection"] = "Same"
-    filtered.loc[first_year_mask, "YoYChangePercent"] = 0.0
-
     # Create institution-based color scale
     institutions = filtered["Institution"].unique()
     institution_color_scale = alt.Scale(domain=list(institutions), scheme="category20")
 
-    # Create change direction color scale for dots
-    change_color_scale = alt.Scale(
-        domain=["Increase", "Same", "Decrease"],
-        range=["#28a745", "#6c757d", "#dc3545"],  # Green, Gray, Red
-    )
-
     # Line layer with dotted lines colored by institution
     lines = (
         alt.Chart(filtered)
         .mark_line(strokeDash=[3, 3], point=False)  # Dotted line pattern
         .encode(
-            x=alt.X("Year:Q", title="Year", axis=alt.Axis(format="d")),
-            y=alt.Y("PellDollarsBillions:Q", title="Pell dollars (billions)"),
+            x=LINE_X,
+            y=LINE_Y,
             color=alt.Color(
                 "Institution:N", title="Institution", scale=institution_color_scale
             ),
-            tooltip=[
-                alt.Tooltip("Institution:N", title="Institution"),
-                alt.Tooltip("Year:Q", title="Year", format=".0f"),
-                alt.Tooltip(
-                    "PellDollarsBillions:Q",
-                    title="Pell dollars (billions)",
-                    format=".2f",
-                ),
-                alt.Tooltip("Sector:N", title="Sector"),
-            ],
+            tooltip=LINE_TOOLTIP,
         )
     )
 
@@ -128,31 +133,7 @@ def render_pell_trend_chart(df: pd.DataFrame, *, title: str) -> None:
     points = (
         alt.Chart(filtered)
         .mark_circle(size=80)
-        .encode(
-            x=alt.X("Year:Q"),
-            y=alt.Y("PellDollarsBillions:Q"),
-            color=alt.Color(
-                "ChangeDirection:N",
-                title="Year-over-Year Change",
-                scale=change_color_scale,
-            ),
-            tooltip=[
-                alt.Tooltip("Institution:N", title="Institution"),
-                alt.Tooltip("Year:Q", title="Year", format=".0f"),
-                alt.Tooltip(
-                    "PellDollarsBillions:Q",
-                    title="Pell dollars (billions)",
-                    format=".2f",
-                ),
-                alt.Tooltip("Sector:N", title="Sector"),
-                alt.Tooltip(
-                    "YoYChangePercent:Q",
-                    title="Year-over-year change (%)",
-                    format=".1f",
-                ),
-                alt.Tooltip("ChangeDirection:N", title="Change direction"),
-            ],
-        )
+        .encode(x=POINT_X, y=POINT_Y, color=POINT_COLOR, tooltip=POINT_TOOLTIP)
     )
 
     # Combine layers
@@ -172,18 +153,21 @@ def render_pell_trend_chart(df: pd.DataFrame, *, title: str) -> None:
     st.caption(caption)
     render_altair_chart(chart)
 
-    summary = filtered.pivot_table(
-        index=["Institution", "Sector"],
-        columns="Year",
-        values="PellDollarsBillions",
-        aggfunc="sum",
-        fill_value=0,
-    ).reset_index()
+    # One value per (UnitID, Year), so a plain unstack replaces the
+    # pivot_table aggregation; UnitID keeps same-named institutions apart
+    summary = (
+        filtered.set_index(["UnitID", "Institution", "Sector", "Year"])[
+            "PellDollarsBillions"
+        ]
+        .unstack("Year", fill_value=0)
+        .reset_index()
+        .drop(columns="UnitID")
+    )
     year_cols = sorted(col for col in summary.columns if isinstance(col, (int, float)))
     str_year_cols = [str(int(col)) for col in year_cols]
-    summary["Total (billions)"] = summary[year_cols].sum(axis=1).round(2)
-    for col in year_cols:
-        summary[col] = summary[col].round(2)
+    summary["Total (billions)"] = summary[year_cols].sum(axis=1)
+    # Round every numeric column in one pass
+    summary = summary.round(dict.fromkeys([*year_cols, "Total (billions)"], 2))
     rename_map = {col: str(int(col)) for col in year_cols}
     summary.rename(columns=rename_map, inplace=True)
     columns = ["Institution", "Sector"] + str_year_cols + ["Total (billions)"]
@@ -6,7 +6,11 @@ import altair as alt
 import pandas as pd
 import streamlit as st
 
-from src.charts.trend_utils import _identify_year_columns, _normalize_unit_ids
+from src.charts.trend_utils import (
+    _normalize_unit_ids,
+    classify_yoy_direction,
+)
+from src.core.year_columns import identify_year_columns
 from src.ui.renderers import render_altair_chart
 
 
@@ -38,7 +42,7 @@ def _prepare_pell_trend_total_dataframe(
     if pell_df.empty:
         return pd.DataFrame()
 
-    year_info = _identify_year_columns(pell_df.columns)
+    year_info = identify_year_columns(pell_df.columns)
     if not year_info:
         raise ValueError(
             "No year columns found in Pell dataset (expected headers like 'YR2022')."
@@ -65,14 +69,15 @@ def _prepare_pell_trend_total_dataframe(
             + ", ".join(sorted(missing_metadata))
         )
 
-    metadata = metadata_df.copy()
+    # Only the key and sector are joined, so copy just those two columns
+    metadata = metadata_df.loc[:, ["UnitID", "sector"]]
     metadata["UnitID"] = _normalize_unit_ids(metadata.get("UnitID"))
     metadata["sector"] = metadata["sector"].astype("string")
 
     # Merge to get sector information
     merged = pd.merge(
         working,
-        metadata[["UnitID", "sector"]],
+        metadata,
         on="UnitID",
         how="inner",
     )
@@ -94,12 +99,10 @@ def _prepare_pell_trend_total_dataframe(
     if long_form.empty:
         return pd.DataFrame()
 
-    long_form["Year"] = long_form["YearLabel"].str.extract(r"(\d{4})").astype(float)
-    long_form.dropna(subset=["Year"], inplace=True)
-    if long_form.empty:
-        return pd.DataFrame()
-
-    long_form["Year"] = long_form["Year"].astype(int)
+    # Every melted label is a known year column, so map the parsed years
+    # (stored as int16, as the distance trends do)
+    year_by_column = {column: year for year, column in year_info}
+    long_form["Year"] = long_form["YearLabel"].map(year_by_column).astype("int16")
 
     # Aggregate by year (sum across all institutions)
     aggregated = (
@@ -118,8 +121,6 @@ def _prepare_pell_trend_total_dataframe(
     aggregated["YoYChangePercent"] = aggregated["pell_dollars"].pct_change() * 100
 
     # Categorize change direction
-    from src.charts.trend_utils import classify_yoy_direction
-
     aggregated["ChangeDirection"] = classify_yoy_direction(
         aggregated["YoYChangePercent"]
     )
@@ -6,14 +6,10 @@ import altair as alt
 import pandas as pd
 import streamlit as st
 
+from src.charts.sector_colors import SECTOR_COLOR_SCALE
 from src.charts.trend_utils import _normalize_unit_ids
 from src.ui.renderers import render_altair_chart, render_dataframe
 
-SECTOR_COLOR_SCALE = alt.Scale(
-    domain=["Public", "Private, not-for-profit", "Private, for-profit", "Unknown"],
-    range=["#2ca02c", "#9467bd", "#1f77b4", "#7f7f7f"],
-)
-
 
 def render_pell_vs_grad_scatter(
     df: pd.DataFrame,
@@ -62,9 +58,9 @@ def render_pell_vs_grad_scatter(
     if "enrollment" in working.columns:
         working["enrollment"] = pd.to_numeric(working["enrollment"], errors="coerce")
 
-    working["Sector"] = (
-        working.get("Sector", "Unknown").fillna("Unknown").replace("", "Unknown")
-    )
+    # Missing and blank sectors become "Unknown" in one masked write
+    sector = working.get("Sector", pd.Series("Unknown", index=working.index))
+    working["Sector"] = sector.mask(sector.isna() | (sector == ""), "Unknown")
     working["Institution"] = working.get("Institution", "")
     working["YearsCovered"] = working.get("YearsCovered", "")
 
@@ -145,9 +141,9 @@ def render_pell_vs_grad_scatter(
         "graduation_rate",
         "enrollment",
     ]
+    # One chain: round the renamed columns without rebinding them
     table_df = (
-        top_filtered[display_columns]
-        .copy()
+        top_filtered.loc[:, display_columns]
         .rename(
             columns={
                 "YearsCovered": "Years",
@@ -157,10 +153,11 @@ def render_pell_vs_grad_scatter(
             }
         )
         .sort_values("Pell dollars (billions)", ascending=False)
+        .round(
+            {"Pell dollars (billions)": 2, "Graduation rate (%)": 1, "Enrollment": 0}
+        )
+        .astype({"Enrollment": int})
     )
-    table_df["Pell dollars (billions)"] = table_df["Pell dollars (billions)"].round(2)
-    table_df["Graduation rate (%)"] = table_df["Graduation rate (%)"].round(1)
-    table_df["Enrollment"] = table_df["Enrollment"].round().astype(int)
 
     st.markdown("**Institutions (top Pell portfolios)**")
     render_dataframe(table_df, width="stretch")
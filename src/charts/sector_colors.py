@@ -0,0 +1,11 @@
+"""Sector color scale shared by the chart modules."""
+
+from __future__ import annotations
+
+import altair as alt
+
+# Built once at import; every chart that colors by sector reuses this scale
+SECTOR_COLOR_SCALE = alt.Scale(
+    domain=["Public", "Private, not-for-profit", "Private, for-profit", "Unknown"],
+    range=["#2ca02c", "#9467bd", "#1f77b4", "#7f7f7f"],
+)
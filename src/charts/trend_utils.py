@@ -2,14 +2,11 @@
 
 from __future__ import annotations
 
-import re
-from typing import Iterable, List
+from typing import List
 
+import numpy as np
 import pandas as pd
 
-# Matches federal-aid year columns named like "YR2022" (case-insensitive).
-YEAR_COLUMN_PATTERN = re.compile(r"^YR(\d{4})$", re.IGNORECASE)
-
 # Percent-change threshold for classifying YoY direction.
 # Changes within +/- this value are labeled "Same".
 # 0.5% balances noise suppression with meaningful signal for both
@@ -25,33 +22,111 @@ def classify_yoy_direction(pct_change: pd.Series) -> pd.Series:
             NaN values are classified as "Same".
 
     Returns:
-        Categorical Series with values "Decrease", "Same", or "Increase".
+        Object-dtype Series with values "Decrease", "Same", or "Increase".
+        Changes at or below ``-YOY_PCT_THRESHOLD`` are "Decrease"; changes
+        above ``YOY_PCT_THRESHOLD`` are "Increase".
     """
-    return (
-        pd.cut(
-            pct_change,
-            bins=[-float("inf"), -YOY_PCT_THRESHOLD, YOY_PCT_THRESHOLD, float("inf")],
-            labels=["Decrease", "Same", "Increase"],
-            include_lowest=True,
-        )
-        .fillna("Same")
-        .astype(str)
+    values = pct_change.to_numpy(dtype=float, na_value=np.nan)
+    # NaN fails both comparisons and falls through to the "Same" default
+    directions = np.select(
+        [values <= -YOY_PCT_THRESHOLD, values > YOY_PCT_THRESHOLD],
+        ["Decrease", "Increase"],
+        default="Same",
     )
-
-
-def _identify_year_columns(columns: Iterable[str]) -> List[tuple[int, str]]:
-    """Return (year, column_name) pairs for YR#### columns, sorted by year."""
-    discovered: List[tuple[int, str]] = []
-    for column in columns:
-        normalized = column.strip()
-        match = YEAR_COLUMN_PATTERN.match(normalized)
-        if match:
-            year = int(match.group(1))
-            discovered.append((year, column))
-    return sorted(discovered)
+    return pd.Series(directions, index=pct_change.index, dtype=object)
 
 
 def _normalize_unit_ids(series: pd.Series) -> pd.Series:
-    """Coerce UnitID values to nullable Int64, preserving exact values."""
+    """Coerce UnitID values to nullable Int64, preserving exact values.
+
+    Integer columns (numpy or nullable) skip the ``to_numeric`` parse, and an
+    existing Int64 column is returned without a copy.
+    """
+    if pd.api.types.is_integer_dtype(series.dtype):
+        return series.astype("Int64", copy=False)
     coerced = pd.to_numeric(series, errors="coerce")
     return coerced.astype("Int64")
+
+
+def _drop_missing_unit_ids(frame: pd.DataFrame) -> pd.DataFrame:
+    """Drop rows without a UnitID and store the rest as plain int32 merge keys.
+
+    Merging on non-nullable integer keys takes pandas' fast hash-join path, and
+    IPEDS UnitIDs (six digits) fit in int32 at half the width of int64. Rows
+    with a missing UnitID can never match metadata anyway.
+    """
+    return frame.dropna(subset=["UnitID"]).astype({"UnitID": "int32"})
+
+
+def _top_n_positions(values: np.ndarray, top_n: int) -> np.ndarray:
+    """Return positions of the ``top_n`` largest values, largest first.
+
+    Uses a partial partition to find the cutoff instead of sorting every value;
+    ties keep their input order, matching ``DataFrame.nlargest(keep="first")``.
+    ``values`` must not contain NaN.
+    """
+    size = len(values)
+    if top_n <= 0 or size == 0:
+        return np.empty(0, dtype=np.intp)
+    if top_n < size:
+        cutoff = np.partition(values, size - top_n)[size - top_n]
+        candidates = np.flatnonzero(values >= cutoff)
+    else:
+        candidates = np.arange(size)
+    order = np.argsort(-values[candidates], kind="stable")
+    return candidates[order[:top_n]]
+
+
+def _sorted_yoy_percent(group_ids: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """Return the rounded year-over-year percent change for rows sorted by group, then year.
+
+    Each row is compared with the row before it; the first row of each group
+    has no previous year and gets 0.0. A previous value of zero gives
+    ``inf``/``NaN`` as the equivalent ``groupby().shift()`` arithmetic would.
+    """
+    values = np.asarray(values, dtype=float)
+    change = np.zeros(len(values))
+    if len(values) < 2:
+        return change
+    previous = values[:-1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        later = np.round((values[1:] - previous) / previous * 100, 1)
+    same_group = group_ids[1:] == group_ids[:-1]
+    change[1:] = np.where(same_group, later, 0.0)
+    return change
+
+
+def _top_dollar_year_table(
+    top: pd.DataFrame,
+    year_columns: List[tuple[int, str]],
+    total_billions_column: str,
+) -> pd.DataFrame:
+    """Build the year-by-year billions table for ranked top-dollar rows.
+
+    The table is the rows' own year matrix: positive amounts are kept (others
+    shown as 0), years and institutions with no positive amount are dropped,
+    and dollars are scaled to billions. Rows keep the order of ``top``.
+
+    Args:
+        top: Ranked rows with ``Institution``, ``sector``, the year columns and
+            ``total_billions_column``.
+        year_columns: ``(year, column_name)`` pairs from ``identify_year_columns``.
+        total_billions_column: Column holding each row's total in billions.
+    """
+    year_values = top[[column for _, column in year_columns]].to_numpy(dtype=np.float64)
+    positive = year_values > 0
+    keep_years = positive.any(axis=0)
+    if not keep_years.any():
+        return pd.DataFrame()
+    year_billions = np.where(positive, year_values, 0.0)
+    year_billions /= 1_000_000_000
+    table_columns = {
+        "Institution": top["Institution"].to_numpy(),
+        "Sector": top["sector"].array,
+        "Total (billions)": top[total_billions_column].round(2).to_numpy(),
+    }
+    for (year, _), keep, values in zip(year_columns, keep_years, year_billions.T):
+        if keep:
+            table_columns[str(year)] = values.round(3)
+    keep_rows = positive.any(axis=1)
+    return pd.DataFrame(table_columns)[keep_rows].reset_index(drop=True)
@@ -20,6 +20,7 @@ from src.config.feature_flags import USE_CANONICAL_GRAD_DATA
 from src.data.datasets import load_processed
 from .data_loader import DataLoader
 from .exceptions import DataLoadError
+from .year_columns import identify_year_columns
 
 
 class DataManager:
@@ -289,7 +290,6 @@ class DataManager:
         ``which`` selects the source: "pell", "loans", or "both". Pell and
         loan coverage differ (Pell from 2008; COD loan reports from 2013).
         """
-        yr_pattern = re.compile(r"^YR(\d{4})$", re.IGNORECASE)
         years: set[int] = set()
         sources = {
             "pell": (self.pell_df,),
@@ -298,10 +298,8 @@ class DataManager:
         }[which]
         for df in sources:
             if df is not None and not df.empty:
-                for col in df.columns:
-                    m = yr_pattern.match(col.strip())
-                    if m:
-                        years.add(int(m.group(1)))
+                # Cached per column set, so repeated page renders skip the parse
+                years.update(year for year, _ in identify_year_columns(df.columns))
         if not years:
             return "2008-2022"  # fallback
         return f"{min(years)}-{max(years)}"
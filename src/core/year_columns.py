@@ -0,0 +1,33 @@
+"""Federal-aid year column detection shared by the data layer and charts."""
+
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import Iterable, List
+
+
+def identify_year_columns(columns: Iterable[str]) -> List[tuple[int, str]]:
+    """Return (year, column_name) pairs for YR#### columns, sorted by year.
+
+    Federal-aid year columns are named like "YR2022" (case-insensitive).
+    """
+    return list(_identify_year_columns_cached(tuple(columns)))
+
+
+@lru_cache(maxsize=32)
+def _identify_year_columns_cached(
+    columns: tuple[str, ...],
+) -> tuple[tuple[int, str], ...]:
+    discovered: List[tuple[int, str]] = []
+    for column in columns:
+        normalized = column.strip()
+        # Plain prefix/digit checks; cheaper than a regex on short names
+        year_digits = normalized[2:]
+        if (
+            len(normalized) == 6
+            and normalized[:2].upper() == "YR"
+            and year_digits.isascii()
+            and year_digits.isdigit()
+        ):
+            discovered.append((int(year_digits), column))
+    return tuple(sorted(discovered))
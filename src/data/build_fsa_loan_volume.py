@@ -195,11 +195,14 @@ def build_loan_totals_by_unitid(tidy: pd.DataFrame) -> pd.DataFrame:
         .reset_index()
         .merge(inst[["opeid", "UnitID", "INSTITUTION"]], on="opeid", how="inner")
     )
-    wide = per_year.pivot_table(
+    # The institutions file has one row per UnitID, so each UnitID carries a
+    # single OPEID and receives at most one (opeid, year) total. That keeps
+    # (UnitID, year) unique for a plain pivot; if a UnitID could take several
+    # OPEIDs, pivot would raise on the duplicate entries.
+    wide = per_year.pivot(
         index=["UnitID", "INSTITUTION"],
         columns="year",
         values="disbursed_usd",
-        aggfunc="sum",
     ).reset_index()
     wide.columns = [f"YR{c}" if isinstance(c, int) else c for c in wide.columns]
     wide = wide.rename(columns={"INSTITUTION": "Institution"})
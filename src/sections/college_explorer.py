@@ -4,7 +4,6 @@ from __future__ import annotations
 
 from typing import List, Optional
 
-import re
 import pandas as pd
 import streamlit as st
 import altair as alt
@@ -20,6 +19,7 @@ from src.config.constants import (
     COLLEGE_EXPLORER_CHARTS,
 )
 from src.config.feature_flags import USE_CANONICAL_GRAD_DATA
+from src.core.year_columns import identify_year_columns
 
 
 class CollegeExplorerSection(BaseSection):
@@ -653,17 +653,14 @@ class CollegeExplorerSection(BaseSection):
         if pell_data.empty and loan_data.empty:
             return pd.DataFrame()
 
-        # Detect year columns dynamically from data
-        yr_pat = re.compile(r"^YR(\d{4})$", re.IGNORECASE)
-        available_year_columns = sorted(
-            col for col in self.data_manager.pell_df.columns if yr_pat.match(col)
+        # Detect year columns dynamically from data (memoized on the columns)
+        available_year_columns = identify_year_columns(
+            self.data_manager.pell_df.columns
         )
 
         trend_records = []
 
-        for year_col in available_year_columns:
-            year = int(year_col[2:])  # Extract year from 'YR2022' -> 2022
-
+        for year, year_col in available_year_columns:
             # Get Pell value
             pell_value = 0
             if not pell_data.empty and year_col in pell_data.columns:
@@ -0,0 +1,148 @@
+"""Tests for distance education top enrollment chart data preparation."""
+
+import pandas as pd
+import pytest
+
+from src.charts.distance_top_enrollment_chart import (
+    ENROLLMENT_TYPES,
+    _identify_enrollment_columns,
+    _prepare_distance_enrollment_dataframe,
+)
+
+DISTANCE_DATA = [
+    {
+        "UnitID": 1,
+        "TOTAL_ENROLL_2024": 30000,
+        "DE_ENROLL_2024": 5000,
+        "SDE_ENROLL_TOTAL": 10000,
+    },
+    {
+        "UnitID": 2,
+        "TOTAL_ENROLL_2024": 20000,
+        "DE_ENROLL_2024": 15000,
+        "SDE_ENROLL_TOTAL": None,
+    },
+    {
+        "UnitID": 3,
+        "TOTAL_ENROLL_2024": 1000,
+        "DE_ENROLL_2024": 800,
+        "SDE_ENROLL_TOTAL": 400,
+    },
+]
+
+METADATA = [
+    {"UnitID": 1, "institution": "Big State U", "sector": "Public"},
+    {"UnitID": 2, "institution": "Online Academy", "sector": None},
+    {"UnitID": 3, "institution": "Small College", "sector": "Private, not-for-profit"},
+]
+
+
+def _enrollment_by_type(chart_data, institution):
+    row = chart_data.set_index("Institution").loc[institution]
+    return {
+        enrollment_type: row[enrollment_type] for enrollment_type in ENROLLMENT_TYPES
+    }
+
+
+class TestIdentifyEnrollmentColumns:
+    def test_splits_columns_by_kind(self):
+        columns = [
+            "UnitID",
+            "DE_ENROLL_2024",
+            "TOTAL_ENROLL_2023",
+            " TOTAL_ENROLL_2024 ",
+            "SDE_ENROLL_2023",
+            "SDE_ENROLL_TOTAL",
+            "DE_ENROLL_TOTAL",
+            "TOTAL_ENROLL_2024_X",
+        ]
+        total, de, sde = _identify_enrollment_columns(columns)
+        assert total == [(2023, "TOTAL_ENROLL_2023"), (2024, " TOTAL_ENROLL_2024 ")]
+        assert de == [(2024, "DE_ENROLL_2024")]
+        assert sde == [(2023, "SDE_ENROLL_2023"), (2024, "SDE_ENROLL_TOTAL")]
+
+
+class TestPrepareDistanceEnrollmentDataframe:
+    def test_one_row_per_institution(self):
+        result = _prepare_distance_enrollment_dataframe(
+            pd.DataFrame(DISTANCE_DATA),
+            pd.DataFrame(METADATA),
+            top_n=2,
+        )
+        assert result.period_label == "2024"
+        assert len(result.chart_data) == 2
+        assert set(result.chart_data["Institution"]) == {
+            "Big State U",
+            "Online Academy",
+        }
+
+    def test_enrollment_breakdown(self):
+        result = _prepare_distance_enrollment_dataframe(
+            pd.DataFrame(DISTANCE_DATA),
+            pd.DataFrame(METADATA),
+            top_n=10,
+        )
+        assert _enrollment_by_type(result.chart_data, "Big State U") == {
+            "Exclusively Distance Education": 5000,
+            "Some Distance Education": 10000,
+            "In-Person Only": 15000,
+        }
+        # Missing some-DE counts as zero
+        assert _enrollment_by_type(result.chart_data, "Online Academy") == {
+            "Exclusively Distance Education": 15000,
+            "Some Distance Education": 0,
+            "In-Person Only": 5000,
+        }
+        # In-person never goes negative when DE counts exceed the total
+        assert (
+            _enrollment_by_type(result.chart_data, "Small College")["In-Person Only"]
+            == 0
+        )
+
+    def test_rows_without_metadata_do_not_take_top_slots(self):
+        data = DISTANCE_DATA + [
+            {
+                "UnitID": 99,
+                "TOTAL_ENROLL_2024": 90000,
+                "DE_ENROLL_2024": 1,
+                "SDE_ENROLL_TOTAL": 1,
+            },
+        ]
+        result = _prepare_distance_enrollment_dataframe(
+            pd.DataFrame(data),
+            pd.DataFrame(METADATA),
+            top_n=2,
+        )
+        assert set(result.chart_data["Institution"]) == {
+            "Big State U",
+            "Online Academy",
+        }
+
+    def test_missing_sector_filled(self):
+        result = _prepare_distance_enrollment_dataframe(
+            pd.DataFrame(DISTANCE_DATA),
+            pd.DataFrame(METADATA),
+            top_n=10,
+        )
+        sectors = result.chart_data.loc[
+            result.chart_data["Institution"] == "Online Academy", "Sector"
+        ]
+        assert (sectors == "Unknown").all()
+
+    def test_missing_year_raises(self):
+        with pytest.raises(ValueError, match="year 2020"):
+            _prepare_distance_enrollment_dataframe(
+                pd.DataFrame(DISTANCE_DATA),
+                pd.DataFrame(METADATA),
+                top_n=10,
+                year=2020,
+            )
+
+    def test_empty_input(self):
+        result = _prepare_distance_enrollment_dataframe(
+            pd.DataFrame(),
+            pd.DataFrame(METADATA),
+            top_n=10,
+        )
+        assert result.period_label is None
+        assert result.chart_data.empty
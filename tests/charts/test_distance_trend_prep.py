@@ -84,6 +84,22 @@ class TestPrepareDeTrendDataframe:
         assert directions[0] == "Same"  # First year
         assert directions[1] == "Decrease"  # 10000 → 9000
 
+    def test_yoy_compares_against_previous_reported_year(self):
+        """A missing middle year is skipped; the change is vs. the prior reported year."""
+        df = pd.DataFrame([
+            {"UnitID": 1, "DE_ENROLL_2022": 1000, "DE_ENROLL_2023": None, "DE_ENROLL_2024": 1500},
+            {"UnitID": 2, "DE_ENROLL_2022": 800, "DE_ENROLL_2023": 900, "DE_ENROLL_2024": 900},
+        ])
+        result = _prepare_de_trend_dataframe(
+            df, _make_metadata(), top_n=10, anchor_year=2024,
+        )
+        bsu = result[result["Institution"] == "Big State U"].sort_values("Year")
+        assert bsu["Year"].tolist() == [2022, 2024]
+        assert bsu["YoYChangePercent"].tolist() == [0.0, 50.0]
+        oa = result[result["Institution"] == "Online Academy"].sort_values("Year")
+        assert oa["YoYChangePercent"].tolist() == [0.0, 12.5, 0.0]
+        assert oa["ChangeDirection"].tolist() == ["Same", "Increase", "Same"]
+
     def test_empty_input(self):
         df = _prepare_de_trend_dataframe(
             pd.DataFrame(), _make_metadata(), top_n=10, anchor_year=2024,
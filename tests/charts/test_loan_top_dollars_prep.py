@@ -0,0 +1,105 @@
+"""Tests for loan top-dollar chart data preparation."""
+
+import pandas as pd
+import pytest
+
+from src.charts.loan_top_dollars_chart import _prepare_top_dollar_dataframe
+
+LOAN_DATA = [
+    {
+        "UnitID": 1,
+        "Institution": "Big State U (COD)",
+        "YR2021": 1_000_000_000,
+        "YR2022": 1_500_000_000,
+    },
+    {
+        "UnitID": 2,
+        "Institution": "Private College",
+        "YR2021": None,
+        "YR2022": 900_000_000,
+    },
+    {
+        "UnitID": 3,
+        "Institution": "Tech Institute",
+        "YR2021": 100_000_000,
+        "YR2022": 50_000_000,
+    },
+    {"UnitID": 4, "Institution": "Zero Loans", "YR2021": 0, "YR2022": None},
+]
+
+METADATA = [
+    {"UnitID": 1, "institution": "Big State U", "sector": "Public"},
+    {"UnitID": 2, "institution": "", "sector": "Private, not-for-profit"},
+    {"UnitID": 3, "institution": "Tech Institute", "sector": None},
+    {"UnitID": 4, "institution": "Zero Loans", "sector": "Public"},
+]
+
+
+def _prepare(top_n=10, loans=LOAN_DATA):
+    return _prepare_top_dollar_dataframe(
+        pd.DataFrame(loans),
+        pd.DataFrame(METADATA),
+        top_n,
+    )
+
+
+class TestPrepareTopDollarDataframe:
+    def test_ranked_by_total_dollars(self):
+        result = _prepare()
+        chart = result.chart_data
+        assert chart["Institution"].tolist() == [
+            "Big State U",
+            "Private College",
+            "Tech Institute",
+        ]
+        assert chart["rank"].tolist() == [1, 2, 3]
+        # Missing years are skipped when summing
+        assert chart["loan_dollars"].tolist() == [
+            2_500_000_000,
+            900_000_000,
+            150_000_000,
+        ]
+        assert chart["loan_dollars_billions"].tolist() == pytest.approx(
+            [2.5, 0.9, 0.15]
+        )
+
+    def test_zero_dollar_institutions_excluded(self):
+        result = _prepare()
+        assert "Zero Loans" not in result.chart_data["Institution"].tolist()
+
+    def test_top_n_limit(self):
+        result = _prepare(top_n=2)
+        assert len(result.chart_data) == 2
+        assert result.requested_top_n == 2
+
+    def test_blank_metadata_name_falls_back_to_loan_name(self):
+        result = _prepare()
+        assert "Private College" in result.chart_data["Institution"].tolist()
+
+    def test_sector_summary(self):
+        result = _prepare()
+        summary = result.sector_summary.set_index("Sector")
+        assert summary.loc["Public", "loan_dollars"] == 2_500_000_000
+        assert summary.loc["Unknown", "loan_dollars"] == 150_000_000
+        assert summary["share_pct"].sum() == pytest.approx(100.0)
+
+    def test_table_has_year_columns(self):
+        result = _prepare()
+        table = result.table_data
+        assert list(table["Institution"]) == [
+            "Big State U",
+            "Private College",
+            "Tech Institute",
+        ]
+        assert {"2021", "2022", "Total (billions)"} <= set(table.columns)
+        assert table.loc[table["Institution"] == "Private College", "2021"].item() == 0
+        assert result.period_label == "2021-2022"
+
+    def test_empty_input(self):
+        result = _prepare(loans=[])
+        assert result.period_label is None
+        assert result.chart_data.empty
+
+    def test_missing_year_columns_raises(self):
+        with pytest.raises(ValueError, match="No year columns"):
+            _prepare(loans=[{"UnitID": 1, "Total": 5}])
@@ -47,6 +47,16 @@ class TestPrepareLoanTrendDataframe:
         )
         assert anchor == 2022
 
+    def test_anchor_year_skips_unreported_year(self):
+        loans = [{**row, "YR2023": None} for row in LOAN_DATA]
+        df, anchor = _prepare_loan_trend_dataframe(
+            _make_loan_df(loans), _make_metadata_df(METADATA), top_n=1,
+        )
+        # Nobody reports 2023, so 2022 ranks and every year of the top institution is kept
+        assert anchor == 2022
+        assert df["Institution"].unique().tolist() == ["Big State U"]
+        assert df["Year"].tolist() == [2020, 2021, 2022]
+
     def test_top_n_filters_institutions(self):
         df, _ = _prepare_loan_trend_dataframe(
             _make_loan_df(LOAN_DATA), _make_metadata_df(METADATA), top_n=2,
@@ -76,6 +86,16 @@ class TestPrepareLoanTrendDataframe:
         assert all(first_years["ChangeDirection"] == "Same")
         assert all(first_years["YoYChangePercent"] == 0.0)
 
+    def test_yoy_skips_missing_year(self):
+        loans = [{"UnitID": 1, "YR2020": 1_000_000_000, "YR2021": None, "YR2022": 1_500_000_000}]
+        df, _ = _prepare_loan_trend_dataframe(
+            _make_loan_df(loans), _make_metadata_df(METADATA), top_n=10,
+        )
+        # 2022 is compared with 2020, the latest earlier reported year
+        assert df["Year"].tolist() == [2020, 2022]
+        assert df["YoYChangePercent"].tolist() == [0.0, 50.0]
+        assert df["ChangeDirection"].tolist() == ["Same", "Increase"]
+
     def test_dollars_converted_to_billions(self):
         df, _ = _prepare_loan_trend_dataframe(
             _make_loan_df(LOAN_DATA), _make_metadata_df(METADATA), top_n=10,
@@ -99,7 +119,7 @@ class TestPrepareLoanTrendDataframe:
 
     def test_missing_metadata_columns_raises(self):
         bad_metadata = pd.DataFrame([{"UnitID": 1, "name": "Foo"}])
-        with pytest.raises(ValueError, match="Missing metadata columns"):
+        with pytest.raises(ValueError, match="Cannot merge loan dataset with metadata"):
             _prepare_loan_trend_dataframe(
                 _make_loan_df(LOAN_DATA), bad_metadata, top_n=10,
             )
@@ -0,0 +1,59 @@
+"""Tests for shared chart metadata preparation."""
+
+import pandas as pd
+import pytest
+
+from src.charts.metadata_utils import _prepare_metadata
+
+
+class TestPrepareMetadata:
+    def test_selects_and_normalizes_columns(self):
+        df = pd.DataFrame(
+            [
+                {
+                    "UnitID": "100654",
+                    "institution": "Alabama A & M",
+                    "sector": "Public",
+                    "extra": 1,
+                },
+                {
+                    "UnitID": None,
+                    "institution": "No ID College",
+                    "sector": "Public",
+                    "extra": 2,
+                },
+                {"UnitID": 100663.0, "institution": "UAB", "sector": None, "extra": 3},
+            ]
+        )
+        result = _prepare_metadata(df, "loan")
+        assert list(result.columns) == ["institution", "sector"]
+        assert result.index.name == "UnitID"
+        assert result.index.dtype == "int32"
+        assert result.index.tolist() == [100654, 100663]
+        assert result["sector"].dtype == "category"
+
+    def test_missing_and_blank_sectors_become_unknown(self):
+        df = pd.DataFrame(
+            [
+                {"UnitID": 1, "institution": "A", "sector": "Public"},
+                {"UnitID": 2, "institution": "B", "sector": None},
+                {"UnitID": 3, "institution": "C", "sector": ""},
+            ]
+        )
+        result = _prepare_metadata(df, "loan")
+        assert result["sector"].tolist() == ["Public", "Unknown", "Unknown"]
+
+    def test_duplicate_unit_ids_raise(self):
+        df = pd.DataFrame(
+            [
+                {"UnitID": 1, "institution": "A", "sector": "Public"},
+                {"UnitID": 1, "institution": "A campus", "sector": "Public"},
+            ]
+        )
+        with pytest.raises(ValueError, match="duplicate UnitIDs"):
+            _prepare_metadata(df, "loan")
+
+    def test_missing_columns_raise_with_dataset_label(self):
+        df = pd.DataFrame({"UnitID": [1], "institution": ["A"]})
+        with pytest.raises(ValueError, match="Cannot merge loan dataset.*sector"):
+            _prepare_metadata(df, "loan")
@@ -0,0 +1,49 @@
+"""Tests for Pell graduation rate scatter data preparation."""
+
+import pandas as pd
+
+from src.charts.pell_grad_rate_scatter_chart import _prepare_pell_grad_rate_dataframe
+
+ROWS = [
+    {
+        "Institution": "Small College",
+        "PellGraduationRate": "55.5",
+        "PellDollars": 1_000_000,
+        "Enrollment": 900,
+        "Sector": None,
+    },
+    {
+        "Institution": "Big State U",
+        "PellGraduationRate": 70,
+        "PellDollars": 900_000_000,
+        "Enrollment": 40_000,
+        "Sector": "Public",
+    },
+    {
+        "Institution": "No Rate",
+        "PellGraduationRate": None,
+        "PellDollars": 5_000_000,
+        "Enrollment": 1_000,
+        "Sector": "Public",
+    },
+    {
+        "Institution": "No Students",
+        "PellGraduationRate": 40,
+        "PellDollars": 5_000_000,
+        "Enrollment": 0,
+        "Sector": "",
+    },
+]
+
+
+class TestPreparePellGradRateDataframe:
+    def test_filters_and_sorts_by_pell_dollars(self):
+        result = _prepare_pell_grad_rate_dataframe(pd.DataFrame(ROWS))
+        assert result["Institution"].tolist() == ["Big State U", "Small College"]
+        assert result["PellDollars"].tolist() == [900_000_000, 1_000_000]
+        assert result["PellGraduationRate"].tolist() == [70.0, 55.5]
+
+    def test_missing_sector_is_unknown(self):
+        result = _prepare_pell_grad_rate_dataframe(pd.DataFrame(ROWS))
+        assert result["Sector"].tolist() == ["Public", "Unknown"]
+        assert result["State"].tolist() == ["", ""]
@@ -0,0 +1,76 @@
+"""Tests for Pell top-dollar chart data preparation."""
+
+import pandas as pd
+import pytest
+
+from src.charts.pell_top_dollars_chart import _prepare_top_dollar_dataframe
+
+PELL_DATA = [
+    {
+        "UnitID": 1,
+        "Institution": "Big State U (FSA)",
+        "YR2012": 9_000_000_000,
+        "YR2021": 300_000_000,
+        "YR2022": 400_000_000,
+    },
+    {
+        "UnitID": 2,
+        "Institution": "Private College",
+        "YR2012": None,
+        "YR2021": None,
+        "YR2022": 200_000_000,
+    },
+    {
+        "UnitID": 3,
+        "Institution": "Tech Institute",
+        "YR2012": 0,
+        "YR2021": 50_000_000,
+        "YR2022": 25_000_000,
+    },
+    {
+        "UnitID": 5,
+        "Institution": "No Metadata",
+        "YR2012": 0,
+        "YR2021": 900_000_000,
+        "YR2022": 900_000_000,
+    },
+]
+
+METADATA = [
+    {"UnitID": 1, "institution": "Big State U", "sector": "Public"},
+    {"UnitID": 2, "institution": "", "sector": "Private, not-for-profit"},
+    {"UnitID": 3, "institution": "Tech Institute", "sector": ""},
+]
+
+
+def _prepare(top_n=10, pell=PELL_DATA, metadata=METADATA):
+    return _prepare_top_dollar_dataframe(
+        pd.DataFrame(pell),
+        pd.DataFrame(metadata),
+        top_n,
+    )
+
+
+class TestPrepareTopDollarDataframe:
+    def test_ranked_by_ranking_years_only(self):
+        result = _prepare()
+        chart = result.chart_data
+        # 2012 precedes RANKING_START_YEAR and institutions without metadata are dropped
+        assert chart["Institution"].tolist() == [
+            "Big State U",
+            "Private College",
+            "Tech Institute",
+        ]
+        assert chart["rank"].tolist() == [1, 2, 3]
+        assert chart["pell_dollars"].tolist() == [700_000_000, 200_000_000, 75_000_000]
+        assert result.period_label == "2021-2022"
+
+    def test_blank_sector_is_unknown(self):
+        result = _prepare()
+        summary = result.sector_summary.set_index("Sector")
+        assert summary.loc["Unknown", "pell_dollars"] == 75_000_000
+        assert summary["share_pct"].sum() == pytest.approx(100.0)
+
+    def test_missing_metadata_columns_raises(self):
+        with pytest.raises(ValueError, match="Cannot merge Pell dataset with metadata"):
+            _prepare(metadata=[{"UnitID": 1, "institution": "Big State U"}])
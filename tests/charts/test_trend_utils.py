@@ -1,8 +1,17 @@
 """Tests for shared YoY trend classification utility."""
 
+import numpy as np
 import pandas as pd
 
-from src.charts.trend_utils import YOY_PCT_THRESHOLD, classify_yoy_direction
+from src.charts.trend_utils import (
+    YOY_PCT_THRESHOLD,
+    _drop_missing_unit_ids,
+    _normalize_unit_ids,
+    _sorted_yoy_percent,
+    _top_dollar_year_table,
+    _top_n_positions,
+    classify_yoy_direction,
+)
 
 
 class TestClassifyYoyDirection:
@@ -38,6 +47,12 @@ class TestClassifyYoyDirection:
         result = classify_yoy_direction(s)
         assert list(result) == ["Same", "Same"]
 
+    def test_nullable_float_and_index_preserved(self):
+        s = pd.Series([2.0, None, -2.0], dtype="Float64", index=[10, 11, 12])
+        result = classify_yoy_direction(s)
+        assert list(result) == ["Increase", "Same", "Decrease"]
+        assert list(result.index) == [10, 11, 12]
+
     def test_empty_series(self):
         s = pd.Series([], dtype=float)
         result = classify_yoy_direction(s)
@@ -47,3 +62,110 @@ class TestClassifyYoyDirection:
         s = pd.Series([1.0, 0.0, -1.0])
         result = classify_yoy_direction(s)
         assert result.dtype == object  # string dtype in pandas
+
+
+class TestNormalizeUnitIds:
+    def test_parses_strings_and_floats(self):
+        s = pd.Series(["100654", "bad", None, 100663.0], dtype=object)
+        result = _normalize_unit_ids(s)
+        assert result.dtype == "Int64"
+        assert result.tolist() == [100654, pd.NA, pd.NA, 100663]
+
+    def test_integer_input_keeps_values(self):
+        for dtype in ("int64", "int32", "Int32"):
+            s = pd.Series([100654, 100663], dtype=dtype)
+            result = _normalize_unit_ids(s)
+            assert result.dtype == "Int64"
+            assert result.tolist() == [100654, 100663]
+
+
+class TestDropMissingUnitIds:
+    def test_drops_missing_and_casts_to_int32(self):
+        df = pd.DataFrame(
+            {"UnitID": ["100654", None, "bad", 100663], "value": [1, 2, 3, 4]}
+        )
+        df["UnitID"] = _normalize_unit_ids(df["UnitID"])
+        result = _drop_missing_unit_ids(df)
+        assert result["UnitID"].dtype == "int32"
+        assert result["UnitID"].tolist() == [100654, 100663]
+        assert result["value"].tolist() == [1, 4]
+
+    def test_does_not_modify_input(self):
+        df = pd.DataFrame({"UnitID": pd.array([1, None], dtype="Int64")})
+        _drop_missing_unit_ids(df)
+        assert df["UnitID"].dtype == "Int64"
+        assert len(df) == 2
+
+
+class TestTopNPositions:
+    def test_largest_first(self):
+        values = np.array([5.0, 50.0, 1.0, 20.0, 30.0])
+        assert _top_n_positions(values, 3).tolist() == [1, 4, 3]
+
+    def test_matches_nlargest_with_ties(self):
+        values = np.array([3.0, 7.0, 7.0, 1.0, 7.0, 2.0])
+        expected = pd.Series(values).nlargest(2).index.tolist()
+        assert _top_n_positions(values, 2).tolist() == expected == [1, 2]
+
+    def test_top_n_larger_than_input(self):
+        values = np.array([1.0, 3.0, 2.0])
+        assert _top_n_positions(values, 10).tolist() == [1, 2, 0]
+
+    def test_empty_and_zero(self):
+        assert _top_n_positions(np.array([]), 5).tolist() == []
+        assert _top_n_positions(np.array([1.0, 2.0]), 0).tolist() == []
+
+
+class TestTopDollarYearTable:
+    def test_keeps_positive_years_in_row_order(self):
+        top = pd.DataFrame(
+            {
+                "Institution": ["Big U", "Small U", "Refund U"],
+                "sector": ["Public", "Unknown", "Public"],
+                "YR2020": [1_000_000_000, None, -5.0],
+                "YR2021": [2_000_000_000, 500_000_000, 0.0],
+                "YR2022": [None, None, None],
+                "total_billions": [3.0, 0.5, 0.0],
+            }
+        )
+        year_columns = [(2020, "YR2020"), (2021, "YR2021"), (2022, "YR2022")]
+        table = _top_dollar_year_table(top, year_columns, "total_billions")
+        assert list(table.columns) == [
+            "Institution",
+            "Sector",
+            "Total (billions)",
+            "2020",
+            "2021",
+        ]
+        assert table["Institution"].tolist() == ["Big U", "Small U"]
+        assert table["2020"].tolist() == [1.0, 0.0]
+        assert table["2021"].tolist() == [2.0, 0.5]
+
+    def test_no_positive_amounts(self):
+        top = pd.DataFrame(
+            {
+                "Institution": ["A"],
+                "sector": ["Public"],
+                "YR2020": [0.0],
+                "total": [0.0],
+            }
+        )
+        assert _top_dollar_year_table(top, [(2020, "YR2020")], "total").empty
+
+
+class TestSortedYoyPercent:
+    def test_first_row_of_each_group_is_zero(self):
+        ids = np.array([1, 1, 1, 2, 2])
+        values = np.array([100.0, 150.0, 120.0, 10.0, 10.0])
+        result = _sorted_yoy_percent(ids, values)
+        assert result.tolist() == [0.0, 50.0, -20.0, 0.0, 0.0]
+
+    def test_zero_previous_value(self):
+        result = _sorted_yoy_percent(np.array([1, 1, 1]), np.array([0.0, 5.0, 0.0]))
+        assert result[0] == 0.0
+        assert np.isinf(result[1])
+        assert result[2] == -100.0
+
+    def test_empty_and_single(self):
+        assert _sorted_yoy_percent(np.array([]), np.array([])).tolist() == []
+        assert _sorted_yoy_percent(np.array([7]), np.array([3.0])).tolist() == [0.0]
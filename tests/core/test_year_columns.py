@@ -0,0 +1,18 @@
+"""Tests for federal-aid year column detection."""
+
+from src.core.year_columns import identify_year_columns
+
+
+class TestIdentifyYearColumns:
+    def test_finds_and_sorts_year_columns(self):
+        columns = ["UnitID", "YR2023", " yr2021 ", "YR22", "YR2022X", "Total", "YR2022"]
+        assert identify_year_columns(columns) == [
+            (2021, " yr2021 "),
+            (2022, "YR2022"),
+            (2023, "YR2023"),
+        ]
+
+    def test_returns_fresh_list(self):
+        first = identify_year_columns(["YR2020"])
+        first.append((1999, "YR1999"))
+        assert identify_year_columns(["YR2020"]) == [(2020, "YR2020")]